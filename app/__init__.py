@@ -1,36 +1,106 @@
-from flask import Flask, url_for, render_template
+from flask import Flask, current_app, g, request, url_for, render_template
 import os
 import click
+from sqlalchemy import event
 from datetime import date, timedelta
 from app.logging_config import setup_logging
 
+# Project root and asset folders, resolved once at import
+BASEDIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+TEMPLATE_DIR = os.path.join(BASEDIR, 'templates')
+STATIC_DIR = os.path.join(BASEDIR, 'static')
 
-def create_app(config_name=None):
-    """Application factory pattern."""
-    if config_name is None:
-        config_name = os.environ.get('FLASK_ENV', 'development')
+def inject_nav():
+    """Global context processor for navigation."""
+    try:
+        # Endpoints are static, so build the URLs once per app and script root
+        nav_cache = current_app.extensions.setdefault('nav_urls', {})
+        nav = nav_cache.get(request.script_root)
+        if nav is None:
+            nav = nav_cache[request.script_root] = {
+                "overview": url_for('dashboard.overview'),
+                "invoices": url_for('invoices.invoices'),
+                "clients": url_for('clients.clients'),
+                "reports": url_for('dashboard.reports'),
+                "settings": url_for('dashboard.settings'),
+            }
+        return {"nav": nav}
+    except RuntimeError:
+        # Return empty nav when outside request context (e.g., PDF generation)
+        return {"nav": {}}
+
+
+def inject_csrf_token():
+    """Make CSRF token available in templates."""
+    from flask_wtf.csrf import generate_csrf
+    return dict(csrf_token=generate_csrf)
+
+
+def set_request_today():
+    """Resolve today's date once per request (see app.models.get_today)."""
+    g.today = date.today()
+
+
+def _init_security(app):
+    """Enable CSRF protection for web workers."""
+    from flask_wtf.csrf import CSRFProtect
     
-    # Get the base directory (project root)
-    basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    CSRFProtect(app)
+    app.context_processor(inject_csrf_token)
+
+
+def _register_blueprints(app):
+    """Import and register route blueprints (skipped for CLI-only apps)."""
+    from app.routes.dashboard import dashboard_bp
+    from app.routes.clients import clients_bp
+    from app.routes.invoices import invoices_bp
+    from app.routes.pdf import pdf_bp
+    
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(clients_bp)
+    app.register_blueprint(invoices_bp)
+    app.register_blueprint(pdf_bp)
+    app.context_processor(inject_nav)
+
+
+def create_app(config_name=None, config_obj=None):
+    """Application factory pattern.
     
+    Pass ``config_obj`` (a config class or object) to use an already resolved
+    configuration, e.g. from test suites; otherwise ``config_name`` or
+    ``FLASK_ENV`` selects one from ``app.config.config``.
+    """
     app = Flask(__name__, 
-                template_folder=os.path.join(basedir, 'templates'),
-                static_folder=os.path.join(basedir, 'static'))
+                template_folder=TEMPLATE_DIR,
+                static_folder=STATIC_DIR)
     
     # Load configuration
-    from app.config import config
-    app.config.from_object(config[config_name])
+    if config_obj is None:
+        from app.config import config
+        if config_name is None:
+            config_name = os.environ.get('FLASK_ENV', 'development')
+        config_obj = config[config_name]
+    app.config.from_object(config_obj)
     
     # Initialize extensions
-    from app.models import db
-    from flask_wtf.csrf import CSRFProtect, generate_csrf
+    from app.models import db, set_sqlite_pragmas
     
     db.init_app(app)
-    csrf = CSRFProtect(app)
+    with app.app_context():
+        # Engines are created by init_app(); no connection is opened here
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', set_sqlite_pragmas)
+    
+    # Web-only setup; CLI invocations can skip blueprint and CSRF imports
+    if not app.config.get('SKIP_BLUEPRINTS'):
+        _init_security(app)
+        _register_blueprints(app)
     
     # Setup logging
     setup_logging(app)
     
+    app.before_request(set_request_today)
+    
     # Security headers
     @app.after_request
     def set_security_headers(response):
@@ -58,124 +128,96 @@ def create_app(config_name=None):
                                  error_message='CSRF token on puudu või vigane. Palun proovi uuesti.'), 400
         return render_template('400.html'), 400
     
-    # Global context processor for navigation
-    @app.context_processor
-    def inject_nav():
-        try:
-            return {
-                "nav": {
-                    "overview": url_for('dashboard.overview'),
-                    "invoices": url_for('invoices.invoices'),
-                    "clients": url_for('clients.clients'),
-                    "reports": url_for('dashboard.reports'),
-                    "settings": url_for('dashboard.settings'),
-                }
-            }
-        except RuntimeError:
-            # Return empty nav when outside request context (e.g., PDF generation)
-            return {"nav": {}}
-    
-    # Make CSRF token available in templates
-    @app.context_processor
-    def inject_csrf_token():
-        return dict(csrf_token=generate_csrf)
-    
-    # Register blueprints
-    from app.routes.dashboard import dashboard_bp
-    from app.routes.clients import clients_bp
-    from app.routes.invoices import invoices_bp
-    from app.routes.pdf import pdf_bp
-    
-    app.register_blueprint(dashboard_bp)
-    app.register_blueprint(clients_bp)
-    app.register_blueprint(invoices_bp)
-    app.register_blueprint(pdf_bp)
-    
     # CLI commands
     @app.cli.command()
     def init_db():
         """Initialize the database."""
         with app.app_context():
+            # Import models so every table is registered on the metadata
+            from app.models import Client, Invoice, InvoiceLine, VatRate, CompanySettings  # noqa: F401
             db.create_all()
+            # create_all() skips existing tables; add indexes introduced since
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(db.engine, checkfirst=True)
             click.echo('Database tables created successfully.')
     
     @app.cli.command()
     def seed_data():
         """Seed the database with sample data."""
         with app.app_context():
+            from sqlalchemy import insert
             from app.models import Client, Invoice, InvoiceLine, VatRate
+            from app.services.totals import calculate_vat_amount, calculate_total
             
             # First ensure VAT rates exist
             VatRate.create_default_rates()
             standard_vat = VatRate.get_default_rate()
+            vat_rate_id = standard_vat.id if standard_vat else None
+            vat_rate = standard_vat.rate if standard_vat else 24
             
-            # Create sample clients
-            client1 = Client(
-                name='Nordics OÜ',
-                registry_code='12345678',
-                email='info@nordics.ee',
-                phone='+372 5555 1234',
-                address='Tallinn, Estonia'
-            )
-            client2 = Client(
-                name='Viridian AS',
-                registry_code='87654321',
-                email='contact@viridian.ee',
-                phone='+372 5555 5678',
-                address='Tartu, Estonia'
-            )
+            # Create sample clients (one multi-row INSERT ... RETURNING)
+            client_ids = db.session.scalars(
+                insert(Client).returning(Client.id, sort_by_parameter_order=True),
+                [
+                    {
+                        'name': 'Nordics OÜ',
+                        'registry_code': '12345678',
+                        'email': 'info@nordics.ee',
+                        'phone': '+372 5555 1234',
+                        'address': 'Tallinn, Estonia'
+                    },
+                    {
+                        'name': 'Viridian AS',
+                        'registry_code': '87654321',
+                        'email': 'contact@viridian.ee',
+                        'phone': '+372 5555 5678',
+                        'address': 'Tartu, Estonia'
+                    },
+                ]
+            ).all()
             
-            db.session.add(client1)
-            db.session.add(client2)
-            db.session.flush()  # Get IDs
+            # Sample invoice lines, one per invoice (totals are known up front)
+            sample_lines = [
+                {'description': 'Web development services', 'qty': 1, 'unit_price': 344.26, 'line_total': 344.26},
+                {'description': 'Consulting services', 'qty': 8, 'unit_price': 131.15, 'line_total': 1049.20},
+            ]
             
             # Create sample invoices
-            invoice1 = Invoice(
-                number='2025-0001',
-                client_id=client1.id,
-                date=date(2025, 8, 10),
-                due_date=date(2025, 8, 24),
-                vat_rate_id=standard_vat.id if standard_vat else None,
-                vat_rate=standard_vat.rate if standard_vat else 24,
-                status='saadetud'
-            )
-            invoice2 = Invoice(
-                number='2025-0002',
-                client_id=client2.id,
-                date=date(2025, 8, 8),
-                due_date=date(2025, 8, 22),
-                vat_rate_id=standard_vat.id if standard_vat else None,
-                vat_rate=standard_vat.rate if standard_vat else 24,
-                status='makstud'
-            )
+            invoice_rows = [
+                {
+                    'number': '2025-0001',
+                    'client_id': client_ids[0],
+                    'date': date(2025, 8, 10),
+                    'due_date': date(2025, 8, 24),
+                    'status': 'saadetud'
+                },
+                {
+                    'number': '2025-0002',
+                    'client_id': client_ids[1],
+                    'date': date(2025, 8, 8),
+                    'due_date': date(2025, 8, 22),
+                    'status': 'makstud'
+                },
+            ]
+            for row, line in zip(invoice_rows, sample_lines):
+                subtotal = line['line_total']
+                row['vat_rate_id'] = vat_rate_id
+                row['vat_rate'] = vat_rate
+                row['subtotal'] = subtotal
+                row['total'] = calculate_total(subtotal, calculate_vat_amount(subtotal, vat_rate))
             
-            db.session.add(invoice1)
-            db.session.add(invoice2)
-            db.session.flush()
+            invoice_ids = db.session.scalars(
+                insert(Invoice).returning(Invoice.id, sort_by_parameter_order=True),
+                invoice_rows
+            ).all()
             
             # Create sample invoice lines
-            line1 = InvoiceLine(
-                invoice_id=invoice1.id,
-                description='Web development services',
-                qty=1,
-                unit_price=344.26,
-                line_total=344.26
-            )
-            line2 = InvoiceLine(
-                invoice_id=invoice2.id,
-                description='Consulting services',
-                qty=8,
-                unit_price=131.15,
-                line_total=1049.20
+            db.session.execute(
+                insert(InvoiceLine),
+                [dict(line, invoice_id=invoice_id) for invoice_id, line in zip(invoice_ids, sample_lines)]
             )
             
-            db.session.add(line1)
-            db.session.add(line2)
-            
-            # Calculate totals
-            invoice1.calculate_totals()
-            invoice2.calculate_totals()
-            
             db.session.commit()
             click.echo('Sample data created successfully.')
             click.echo(f'Created invoices with VAT rate: {standard_vat.name if standard_vat else "24% (fallback)"}')
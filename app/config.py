@@ -6,7 +6,17 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///billipocket.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Room for every distinct statement the app issues in the compiled SQL cache
+    SQLALCHEMY_ENGINE_OPTIONS = {'query_cache_size': 1200}
     WTF_CSRF_ENABLED = True
+    # CLI-only processes (flask init-db, seed-data, ...) can skip web setup
+    SKIP_BLUEPRINTS = os.environ.get('SKIP_BLUEPRINTS') == '1'
+    # Seconds to cache dashboard metrics in memory (0 disables caching)
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 30))
+    # Minimum seconds between overdue status sweeps run by page views (0 sweeps on every view)
+    OVERDUE_UPDATE_INTERVAL = int(os.environ.get('OVERDUE_UPDATE_INTERVAL', 300))
+    # Number of generated invoice PDFs to keep in memory (0 disables caching)
+    PDF_CACHE_SIZE = int(os.environ.get('PDF_CACHE_SIZE', 32))
     
 
 class DevelopmentConfig(Config):
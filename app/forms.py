@@ -1,22 +1,30 @@
+import re
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, DecimalField, DateField, SelectField, FieldList, FormField, HiddenField
 from wtforms.validators import DataRequired, Email, Optional, NumberRange, Length, ValidationError
 from datetime import date, timedelta
+from app.models import db, Invoice, VatRate
+
+# Expected invoice number format: YYYY-NNNN (e.g., 2025-0001)
+INVOICE_NUMBER_RE = re.compile(r'\A\d{4}-\d{4}\Z')
+
+
+def _get_vat_rates():
+    """Get all VAT rates, loaded once per transaction."""
+    return VatRate.get_all_rates()
 
 
 def validate_unique_invoice_number(form, field):
     """Custom validator to ensure invoice number is unique."""
-    from app.models import Invoice
-    
     # Get the invoice being edited (if any)
     invoice_id = getattr(form, '_invoice_id', None)
     
-    # Check if another invoice already has this number
-    existing_invoice = Invoice.query.filter_by(number=field.data).first()
+    # Check if another invoice already has this number (id only, no entity load)
+    existing_id = db.session.query(Invoice.id).filter_by(number=field.data).scalar()
     
-    if existing_invoice:
+    if existing_id is not None:
         # If editing an invoice, allow the same number if it belongs to the same invoice
-        if invoice_id and existing_invoice.id == invoice_id:
+        if invoice_id and existing_id == invoice_id:
             return  # This is fine - same invoice keeping its number
         else:
             # Another invoice already has this number
@@ -25,26 +33,24 @@ def validate_unique_invoice_number(form, field):
 
 def validate_invoice_number_format(form, field):
     """Custom validator to ensure invoice number follows the correct format."""
-    import re
-    
     if not field.data:
         return
     
-    # Expected format: YYYY-NNNN (e.g., 2025-0001)
-    if not re.match(r'^\d{4}-\d{4}$', field.data):
+    if not INVOICE_NUMBER_RE.match(field.data):
         raise ValidationError('Arve number peab olema kujul AAAA-NNNN (näiteks: 2025-0001).')
 
 
 def validate_status_change(form, field):
     """Custom validator to prevent invalid status changes."""
-    from app.models import Invoice
-    
     # Get the invoice being edited (if any)
     invoice_id = getattr(form, '_invoice_id', None)
     if not invoice_id:
         return  # New invoice, no restrictions
     
-    invoice = Invoice.query.get(invoice_id)
+    # Routes pass the already-loaded invoice to avoid another lookup
+    invoice = getattr(form, '_invoice', None)
+    if not isinstance(invoice, Invoice):
+        invoice = db.session.get(Invoice, invoice_id)
     if not invoice:
         return  # Invoice not found, let it pass
     
@@ -59,18 +65,23 @@ class ClientForm(FlaskForm):
     """Form for creating and editing clients."""
     name = StringField('Nimi', validators=[DataRequired(message='Nimi on kohustuslik')])
     registry_code = StringField('Registrikood', validators=[Optional(), Length(max=20)])
-    email = StringField('E-post', validators=[Optional(), Email(message='Vigane e-posti aadress')])
+    email = StringField('E-post', validators=[Optional(), Email(message='Vigane e-posti aadress', check_deliverability=False)])
     phone = StringField('Telefon', validators=[Optional(), Length(max=20)])
     address = TextAreaField('Aadress', validators=[Optional()])
 
 
 class InvoiceLineForm(FlaskForm):
     """Form for individual invoice lines."""
+    
+    class Meta:
+        # Lines are nested in InvoiceForm, which already carries the CSRF token
+        csrf = False
+    
     id = HiddenField()
     description = StringField('Kirjeldus', validators=[DataRequired(message='Kirjeldus on kohustuslik')])
     qty = DecimalField('Kogus', validators=[DataRequired(message='Kogus on kohustuslik'), NumberRange(min=0.01, message='Kogus peab olema positiivne')])
     unit_price = DecimalField('Ühiku hind', validators=[DataRequired(message='Ühiku hind on kohustuslik'), NumberRange(min=0, message='Hind ei saa olla negatiivne')])
-    line_total = DecimalField('Kokku', validators=[Optional()])
+    line_total = HiddenField('Kokku')  # Always recomputed server-side, no Decimal coercion needed
 
 
 class InvoiceForm(FlaskForm):
@@ -134,7 +145,7 @@ class CompanySettingsForm(FlaskForm):
     company_registry_code = StringField('Registrikood', validators=[Optional(), Length(max=50)])
     company_vat_number = StringField('KMKR number', validators=[Optional(), Length(max=50)])
     company_phone = StringField('Telefon', validators=[Optional(), Length(max=50)])
-    company_email = StringField('E-post', validators=[Optional(), Email(message='Vigane e-posti aadress')])
+    company_email = StringField('E-post', validators=[Optional(), Email(message='Vigane e-posti aadress', check_deliverability=False)])
     company_website = StringField('Veebileht', validators=[Optional(), Length(max=255)])
     company_logo_url = StringField('Logo URL', validators=[Optional(), Length(max=500)])
     default_vat_rate = DecimalField('Vaikimisi KM määr (%)', 
@@ -163,17 +174,15 @@ class VatRateForm(FlaskForm):
     is_active = SelectField('Staatus', choices=[
         (True, 'Aktiivne'),
         (False, 'Mitteaktiivne')
-    ], default=True, coerce=lambda x: x == 'True')
+    ], default=True, coerce=lambda x: x in (True, 'True'))  # choices are coerced too
     
     def validate_rate(self, field):
         """Ensure the rate is unique when creating or editing."""
-        from app.models import VatRate
-        
         # Get the VAT rate being edited (if any)
         vat_rate_id = getattr(self, '_vat_rate_id', None)
         
         # Check if another VAT rate already has this rate
-        existing_rate = VatRate.query.filter_by(rate=field.data).first()
+        existing_rate = next((vr for vr in _get_vat_rates() if vr.rate == field.data), None)
         
         if existing_rate:
             # If editing a VAT rate, allow the same rate if it belongs to the same record
@@ -185,13 +194,11 @@ class VatRateForm(FlaskForm):
     
     def validate_name(self, field):
         """Ensure the name is unique when creating or editing."""
-        from app.models import VatRate
-        
         # Get the VAT rate being edited (if any)
         vat_rate_id = getattr(self, '_vat_rate_id', None)
         
         # Check if another VAT rate already has this name
-        existing_rate = VatRate.query.filter_by(name=field.data).first()
+        existing_rate = next((vr for vr in _get_vat_rates() if vr.name == field.data), None)
         
         if existing_rate:
             # If editing a VAT rate, allow the same name if it belongs to the same record
@@ -1,10 +1,76 @@
+import time
+from itertools import chain
+from flask import abort, current_app, g, has_app_context, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, update, and_, exists, func, case, event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime, date
 from decimal import Decimal
 
 db = SQLAlchemy()
 
 
+def get_today():
+    """Get today's date, computed once per request when inside one."""
+    if has_request_context() and 'today' in g:
+        return g.today
+    return date.today()
+
+
+# g attributes memoizing lookups of rarely changing tables (see cached_lookup)
+CACHED_LOOKUP_KEYS = ('_vat_rates', '_active_vat_rates', '_company_settings', '_client_choices')
+
+
+def cached_lookup(key, loader):
+    """Return ``loader()``, memoized on ``g`` for the current transaction.
+    
+    ``key`` must be listed in CACHED_LOOKUP_KEYS so the value is dropped on
+    commit, rollback and when VAT rates or company settings are written.
+    """
+    if not has_app_context():
+        return loader()
+    if key not in g:
+        setattr(g, key, loader())
+    return getattr(g, key)
+
+
+def clear_cached_lookups():
+    """Forget all lookups memoized by cached_lookup()."""
+    if has_app_context():
+        for key in CACHED_LOOKUP_KEYS:
+            g.pop(key, None)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_soft_rollback')
+def _clear_lookups_on_transaction_end(session, *args):
+    """Committed instances are expired and rolled back ones may be gone."""
+    clear_cached_lookups()
+
+
+@event.listens_for(Session, 'after_flush')
+def _clear_lookups_on_write(session, flush_context):
+    """Drop memoized lookups when VAT rates or company settings change."""
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (VatRate, CompanySettings)):
+            clear_cached_lookups()
+            return
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Enforce foreign keys and use WAL journaling with relaxed fsync for SQLite.
+    
+    Registered by create_app() as a 'connect' listener on the app's SQLite
+    engine only, so other engines in the process keep SQLite's defaults.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
 class VatRate(db.Model):
     """VAT rate model for storing different VAT percentages."""
     __tablename__ = 'vat_rates'
@@ -26,15 +92,25 @@ class VatRate(db.Model):
     def __repr__(self):
         return f'<VatRate {self.name}: {self.rate}%>'
     
+    @classmethod
+    def get_all_rates(cls):
+        """Get all VAT rates ordered by rate (cached per transaction)."""
+        return cached_lookup('_vat_rates', lambda: cls.query.order_by(cls.rate.asc()).all())
+    
     @classmethod
     def get_active_rates(cls):
-        """Get all active VAT rates ordered by rate."""
-        return cls.query.filter_by(is_active=True).order_by(cls.rate.asc()).all()
+        """Get all active VAT rates ordered by rate (cached per transaction)."""
+        # Filtered from all rates, so one query serves both lookups
+        return cached_lookup(
+            '_active_vat_rates',
+            lambda: [rate for rate in cls.get_all_rates() if rate.is_active]
+        )
     
     @classmethod
     def get_default_rate(cls):
         """Get the Estonian standard VAT rate (24%)."""
-        return cls.query.filter_by(rate=24.00, is_active=True).first()
+        # Picked from the cached active rates instead of querying again
+        return next((rate for rate in cls.get_active_rates() if rate.rate == 24), None)
     
     @classmethod
     def create_default_rates(cls):
@@ -46,15 +122,20 @@ class VatRate(db.Model):
             {'name': 'Standardmäär (24%)', 'rate': 24.00, 'description': 'Eesti standardne käibemaksumäär'}
         ]
         
-        for rate_data in default_rates:
-            existing_rate = cls.query.filter_by(rate=rate_data['rate']).first()
-            if not existing_rate:
-                new_rate = cls(
-                    name=rate_data['name'],
-                    rate=rate_data['rate'],
-                    description=rate_data['description']
-                )
-                db.session.add(new_rate)
+        dialect = db.engine.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            # One INSERT ... ON CONFLICT (rate) DO NOTHING for all default rates
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            db.session.execute(
+                insert(cls).values(default_rates).on_conflict_do_nothing(index_elements=['rate'])
+            )
+        else:
+            existing = set(db.session.scalars(select(cls.rate)))
+            db.session.add_all(cls(**rate_data) for rate_data in default_rates
+                               if rate_data['rate'] not in existing)
         
         try:
             db.session.commit()
@@ -76,27 +157,122 @@ class Client(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship
+    # The ORM deletes invoices (and their lines) itself: ON DELETE CASCADE on
+    # the foreign keys only exists in databases created by this schema version
     invoices = db.relationship('Invoice', backref='client', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        db.Index('ix_clients_name', 'name'),
+    )
+    
     def __repr__(self):
         return f'<Client #{self.id}: "{self.name}" ({self.email or "no email"})>'
     
-    @property
+    @classmethod
+    def get_choices(cls):
+        """Get ``(id, name)`` pairs of all clients ordered by name, for select fields (cached per transaction)."""
+        return cached_lookup('_client_choices', cls._load_choices)
+    
+    @classmethod
+    def _load_choices(cls):
+        """Query the two columns the dropdowns need, without loading clients."""
+        rows = db.session.execute(select(cls.id, cls.name).order_by(cls.name.asc(), cls.id.asc()))
+        return [(client_id, name) for client_id, name in rows]
+    
+    @classmethod
+    def stats_subquery(cls):
+        """Per-client invoice roll-up, aggregated once over the invoices table.
+        
+        Columns: ``client_id``, ``invoice_count``, ``last_invoice_date`` and
+        ``total_revenue`` (non-draft invoices only). Clients without invoices
+        have no row, so outer join it and coalesce the counters.
+        """
+        return (select(
+                    Invoice.client_id.label('client_id'),
+                    func.count(Invoice.id).label('invoice_count'),
+                    func.max(Invoice.date).label('last_invoice_date'),
+                    func.sum(case((Invoice.status != 'mustand', Invoice.total), else_=0)).label('total_revenue')
+                )
+                .group_by(Invoice.client_id)
+                .subquery('client_stats'))
+    
+    # Per-instance statistics; the clients listing reads them from stats_subquery().
+    # When the invoices are not loaded, each one is a single scalar SELECT instead
+    # of hydrating every invoice (and its lines) just to count or sum them.
+    def _invoices_unloaded(self):
+        """Whether statistics should be computed in SQL rather than in Python."""
+        return self.id is not None and 'invoices' in inspect(self).unloaded
+    
+    def _scalar_stat(self, expression):
+        """Evaluate a statistic's SQL expression for this client."""
+        cls = type(self)
+        return db.session.scalar(select(expression).where(cls.id == self.id))
+    
+    @hybrid_property
+    def has_invoices(self):
+        """Check whether this client has any invoices."""
+        if self._invoices_unloaded():
+            return self._scalar_stat(type(self).has_invoices)
+        return bool(self.invoices)
+    
+    @has_invoices.expression
+    def has_invoices(cls):
+        """SQL EXISTS over the client's invoices (stops at the first row)."""
+        return exists().where(Invoice.client_id == cls.id)
+    
+    @hybrid_property
     def invoice_count(self):
         """Get total number of invoices for this client."""
+        if self._invoices_unloaded():
+            return self._scalar_stat(type(self).invoice_count)
         return len(self.invoices)
     
-    @property
+    @invoice_count.expression
+    def invoice_count(cls):
+        """SQL expression counting the client's invoices."""
+        return (select(func.count(Invoice.id))
+                .where(Invoice.client_id == cls.id)
+                .correlate_except(Invoice)
+                .scalar_subquery())
+    
+    @hybrid_property
     def last_invoice_date(self):
         """Get the date of the most recent invoice."""
+        if self._invoices_unloaded():
+            return self._scalar_stat(type(self).last_invoice_date)
         if self.invoices:
             return max(invoice.date for invoice in self.invoices)
         return None
     
-    @property
+    @last_invoice_date.expression
+    def last_invoice_date(cls):
+        """SQL expression for the date of the most recent invoice."""
+        return (select(func.max(Invoice.date))
+                .where(Invoice.client_id == cls.id)
+                .correlate_except(Invoice)
+                .scalar_subquery())
+    
+    @hybrid_property
     def total_revenue(self):
         """Calculate total revenue from this client."""
+        if self._invoices_unloaded():
+            return self._scalar_stat(type(self).total_revenue)
         return sum(invoice.total for invoice in self.invoices if invoice.status != 'mustand')
+    
+    @total_revenue.expression
+    def total_revenue(cls):
+        """SQL expression summing revenue from non-draft invoices."""
+        return (select(func.coalesce(func.sum(Invoice.total), 0))
+                .where(Invoice.client_id == cls.id, Invoice.status != 'mustand')
+                .correlate_except(Invoice)
+                .scalar_subquery())
+
+
+# app.extensions key holding (today, next_sweep_at) of Invoice.refresh_overdue_statuses()
+OVERDUE_SWEEP_KEY = 'overdue_sweep'
+
+# Invoice attributes that the stored subtotal/total are derived from
+TOTALS_INPUTS = ('subtotal', 'total', 'vat_rate', 'vat_rate_id', 'vat_rate_obj')
 
 
 class Invoice(db.Model):
@@ -105,7 +281,7 @@ class Invoice(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     number = db.Column(db.String(20), nullable=False, unique=True)
-    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=False)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id', ondelete='CASCADE'), nullable=False)
     date = db.Column(db.Date, nullable=False, default=date.today)
     due_date = db.Column(db.Date, nullable=False)
     subtotal = db.Column(db.Numeric(10, 2), nullable=False, default=0)
@@ -117,28 +293,69 @@ class Invoice(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship
-    lines = db.relationship('InvoiceLine', backref='invoice', lazy=True, cascade='all, delete-orphan')
+    # Lines are needed whenever a single invoice is shown, edited or rendered to PDF,
+    # so load them with one batched IN query instead of a lazy load per invoice
+    lines = db.relationship('InvoiceLine', backref='invoice', lazy='selectin', cascade='all, delete-orphan')
     
     __table_args__ = (
         db.CheckConstraint('subtotal >= 0', name='check_subtotal_positive'),
         db.CheckConstraint('total >= 0', name='check_total_positive'),
         db.CheckConstraint('vat_rate >= 0', name='check_vat_rate_positive'),
         db.CheckConstraint("status IN ('mustand', 'saadetud', 'makstud', 'tähtaeg ületatud')", name='check_status_valid'),
+        db.Index('ix_invoices_client_status_date', 'client_id', 'status', 'date'),
+        # A client's invoices newest first, without a sort step
+        db.Index('ix_invoices_client_date', 'client_id', 'date'),
+        # Dashboard/overdue filters: status equality plus a date range
+        db.Index('ix_invoices_status_date', 'status', 'date'),
+        db.Index('ix_invoices_status_due', 'status', 'due_date'),
+        # Invoices listing order (date, id), so a page is read straight off the index
+        db.Index('ix_invoices_date_id', 'date', 'id'),
     )
     
     def __repr__(self):
         return f'<Invoice {self.number}: {self.client.name if self.client else "No Client"} - €{self.total} ({self.status})>'
     
+    @classmethod
+    def get_or_404(cls, invoice_id, *options):
+        """Get an invoice by primary key (identity map first) or abort with 404.
+        
+        ``options`` are loader options, e.g. to eager-load the client.
+        """
+        invoice = db.session.get(cls, invoice_id, options=options)
+        if invoice is None:
+            abort(404)
+        return invoice
+    
     @property
     def vat_amount(self):
-        """Calculate VAT amount."""
+        """Calculate VAT amount.
+        
+        Saved invoices whose totals are not being changed read it from the
+        persisted columns, which avoids loading the VAT rate on every render.
+        """
+        # Only use values already loaded and unchanged (checking must not trigger
+        # a refresh, which would autoflush pending changes first)
+        state = inspect(self)
+        if (state.persistent
+                and all(state.dict.get(name) is not None for name in ('subtotal', 'total'))
+                and not any(name in state.committed_state for name in TOTALS_INPUTS)):
+            return self.total - self.subtotal
         effective_rate = self.get_effective_vat_rate()
         return self.subtotal * (effective_rate / 100)
     
-    @property
+    @hybrid_property
     def is_overdue(self):
         """Check if invoice is overdue."""
-        return self.due_date < date.today() and self.status in ['saadetud']
+        return self.due_date < get_today() and self.status in ['saadetud']
+    
+    @is_overdue.expression
+    def is_overdue(cls):
+        """SQL expression for sent invoices past their due date.
+        
+        Today's date is bound as a parameter (not CURRENT_DATE) so SQL and
+        Python agree on the local date; served by ix_invoices_status_due.
+        """
+        return and_(cls.status == 'saadetud', cls.due_date < get_today())
     
     @property
     def is_paid(self):
@@ -161,9 +378,31 @@ class Invoice(db.Model):
             return self.vat_rate_obj.rate
         return self.vat_rate
     
+    def stored_lines_subtotal(self):
+        """Sum the saved line totals in SQL without loading the lines.
+        
+        Returns None when the lines collection is already loaded (it may hold
+        unsaved changes) or the invoice is not saved yet. Autoflush pushes any
+        pending lines before the SUM runs.
+        """
+        state = inspect(self)
+        if not state.persistent or 'lines' not in state.unloaded:
+            return None
+        return db.session.scalar(
+            select(func.coalesce(func.sum(InvoiceLine.line_total), 0))
+            .where(InvoiceLine.invoice_id == self.id)
+        )
+    
     def calculate_totals(self):
-        """Calculate invoice totals from lines."""
-        self.subtotal = sum(line.line_total for line in self.lines)
+        """Calculate invoice totals from lines.
+        
+        If the lines collection is not loaded yet, the subtotal is summed in
+        SQL instead of hydrating every line just to add up line totals.
+        """
+        subtotal = self.stored_lines_subtotal()
+        if subtotal is None:
+            subtotal = sum(line.line_total for line in self.lines)
+        self.subtotal = subtotal
         self.total = self.subtotal + self.vat_amount
     
     def update_status_if_overdue(self):
@@ -201,20 +440,70 @@ class Invoice(db.Model):
     
     @classmethod
     def update_overdue_invoices(cls):
-        """Class method to update all overdue invoices."""
-        today = date.today()
-        overdue_invoices = cls.query.filter(
-            cls.due_date < today,
-            cls.status == 'saadetud'
-        ).all()
+        """Class method to update all overdue invoices in a single UPDATE.
+        
+        Returns:
+            int: Number of invoices marked as overdue
+        """
+        # 'fetch' keeps already loaded invoices in the session in sync
+        return cls.query.filter(cls.is_overdue).update({
+            'status': 'tähtaeg ületatud',
+            'updated_at': datetime.utcnow()
+        }, synchronize_session='fetch')
+    
+    @classmethod
+    def refresh_overdue_statuses(cls):
+        """Mark overdue invoices and commit, at most once per ``OVERDUE_UPDATE_INTERVAL``.
+        
+        Page views call this instead of update_overdue_invoices(), so the
+        UPDATE does not run on every request; ``flask update-overdue`` (e.g.
+        from cron) still sweeps unconditionally. A new day always sweeps.
         
-        count = 0
-        for invoice in overdue_invoices:
-            invoice.status = 'tähtaeg ületatud'
-            invoice.updated_at = datetime.utcnow()
-            count += 1
+        Returns:
+            int: Number of invoices marked as overdue (0 when skipped)
+        """
+        interval = current_app.config.get('OVERDUE_UPDATE_INTERVAL', 0)
+        today = get_today()
+        now = time.monotonic()
+        last_sweep = current_app.extensions.get(OVERDUE_SWEEP_KEY)
+        if interval and last_sweep and last_sweep[0] == today and last_sweep[1] > now:
+            return 0
         
-        return count
+        updated_count = cls.update_overdue_invoices()
+        if updated_count > 0:
+            db.session.commit()
+        current_app.extensions[OVERDUE_SWEEP_KEY] = (today, now + interval)
+        return updated_count
+    
+    @classmethod
+    def recalculate_totals(cls, *criteria):
+        """Recalculate totals of all matching invoices in a single UPDATE.
+        
+        Subtotal and total are computed by the database from the invoice lines
+        and the effective VAT rate, without loading invoices or lines.
+        
+        Returns:
+            int: Number of invoices updated
+        """
+        subtotal = (select(func.coalesce(func.sum(InvoiceLine.line_total), 0))
+                    .where(InvoiceLine.invoice_id == cls.id)
+                    .scalar_subquery())
+        effective_rate = func.coalesce(
+            select(VatRate.rate).where(VatRate.id == cls.vat_rate_id).scalar_subquery(),
+            cls.vat_rate
+        )
+        result = db.session.execute(
+            update(cls)
+            .where(*criteria)
+            .values(
+                subtotal=subtotal,
+                vat_rate=effective_rate,
+                total=func.round(subtotal + subtotal * effective_rate / 100, 2),
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session='fetch')
+        )
+        return result.rowcount
 
 
 class InvoiceLine(db.Model):
@@ -222,7 +511,7 @@ class InvoiceLine(db.Model):
     __tablename__ = 'invoice_lines'
     
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False)
     description = db.Column(db.String(500), nullable=False)
     qty = db.Column(db.Numeric(10, 2), nullable=False, default=1)
     unit_price = db.Column(db.Numeric(10, 2), nullable=False)
@@ -232,6 +521,7 @@ class InvoiceLine(db.Model):
         db.CheckConstraint('qty > 0', name='check_qty_positive'),
         db.CheckConstraint('unit_price >= 0', name='check_unit_price_non_negative'),
         db.CheckConstraint('line_total >= 0', name='check_line_total_non_negative'),
+        db.Index('ix_invoice_lines_invoice_id', 'invoice_id'),
     )
     
     def __repr__(self):
@@ -260,6 +550,11 @@ class CompanySettings(db.Model):
     @classmethod
     def get_settings(cls):
         """Get current company settings (create default if none exist)."""
+        return cached_lookup('_company_settings', cls._load_settings)
+    
+    @classmethod
+    def _load_settings(cls):
+        """Load the settings row, creating it on first use."""
         settings = cls.query.first()
         if not settings:
             settings = cls(company_name='Minu Ettevõte')
@@ -2,21 +2,35 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from app.models import db, Client, Invoice
 from app.forms import ClientForm, ClientSearchForm
 from app.logging_config import get_logger
-from sqlalchemy import or_
+from sqlalchemy import or_, func, cast, select, Float
+from sqlalchemy.orm import lazyload
+from sqlalchemy.orm.attributes import set_committed_value
 
 logger = get_logger(__name__)
 
 clients_bp = Blueprint('clients', __name__)
 
+# Clients shown per page in the clients listing
+CLIENTS_PER_PAGE = 50
+
 
 @clients_bp.route('/clients')
 def clients():
     """Clients management page with search and filtering."""
     search_form = ClientSearchForm()
     search_query = request.args.get('search', '').strip()
+    page = request.args.get('page', 1, type=int)
     
-    # Build query
-    query = Client.query
+    # Build query; per-client statistics come from the pre-aggregated roll-up
+    # (revenue is cast to float in SQL, which is all the listing needs)
+    stats = Client.stats_subquery()
+    query = (db.session.query(
+                Client,
+                func.coalesce(stats.c.invoice_count, 0),
+                stats.c.last_invoice_date,
+                cast(func.coalesce(stats.c.total_revenue, 0), Float)
+             )
+             .outerjoin(stats, stats.c.client_id == Client.id))
     
     if search_query:
         query = query.filter(
@@ -27,24 +41,48 @@ def clients():
             )
         )
     
-    clients_list = query.order_by(Client.name.asc()).all()
+    # Summary cards cover all matching clients, not just the current page;
+    # the client count also sizes the pager
+    total_clients, active_clients, total_revenue_sum, total_invoices = query.with_entities(
+        func.count(Client.id),
+        func.count(stats.c.client_id),
+        cast(func.coalesce(func.sum(stats.c.total_revenue), 0), Float),
+        func.coalesce(func.sum(stats.c.invoice_count), 0)
+    ).one()
+    pages = max(1, -(-total_clients // CLIENTS_PER_PAGE))
+    page = min(max(page, 1), pages)
+    
+    clients_list = (query.order_by(Client.name.asc(), Client.id.asc())
+                    .limit(CLIENTS_PER_PAGE)
+                    .offset((page - 1) * CLIENTS_PER_PAGE)
+                    .all())
     
     # Prepare client data with statistics
     clients_data = []
-    for client in clients_list:
+    for client, invoice_count, last_invoice_date, total_revenue in clients_list:
         clients_data.append({
             'id': client.id,
             'name': client.name,
             'registry_code': client.registry_code,
             'email': client.email,
             'phone': client.phone,
-            'invoices': client.invoice_count,
-            'last': client.last_invoice_date.strftime('%Y-%m-%d') if client.last_invoice_date else None,
-            'total_revenue': float(client.total_revenue)
+            'invoices': invoice_count,
+            'last': last_invoice_date.strftime('%Y-%m-%d') if last_invoice_date else None,
+            'total_revenue': total_revenue
         })
     
+    summary = {
+        'total': total_clients,
+        'active': active_clients,
+        'revenue': total_revenue_sum,
+        'avg_invoices': total_invoices / total_clients if total_clients else 0
+    }
+    pagination = {'page': page, 'pages': pages, 'per_page': CLIENTS_PER_PAGE}
+    
     return render_template('clients.html', 
                          clients=clients_data, 
+                         summary=summary,
+                         pagination=pagination,
                          search_form=search_form,
                          search_query=search_query)
 
@@ -113,8 +151,14 @@ def view_client(client_id):
     """View client details."""
     client = Client.query.get_or_404(client_id)
     
-    # Get client's invoices
-    invoices = Invoice.query.filter_by(client_id=client_id).order_by(Invoice.date.desc()).all()
+    # Get client's invoices; the page shows no line items, so lines stay unloaded
+    # (switch to selectinload(Invoice.lines) if the template starts iterating them)
+    invoices = (Invoice.query.options(lazyload(Invoice.lines))
+                .filter_by(client_id=client_id)
+                .order_by(Invoice.date.desc())
+                .all())
+    # The detail statistics are computed from these, not another invoices query
+    set_committed_value(client, 'invoices', invoices)
     
     return render_template('client_detail.html', client=client, invoices=invoices)
 
@@ -148,8 +192,8 @@ def delete_client(client_id):
     """Delete client."""
     client = Client.query.get_or_404(client_id)
     
-    # Check if client has invoices
-    if client.invoices:
+    # Check if client has invoices (EXISTS, without loading them)
+    if client.has_invoices:
         flash(f'Klienti "{client.name}" ei saa kustutada, kuna tal on arveid.', 'warning')
         return redirect(url_for('clients.view_client', client_id=client_id))
     
@@ -168,11 +212,14 @@ def delete_client(client_id):
 @clients_bp.route('/api/clients')
 def api_clients():
     """API endpoint for client list (for dropdowns etc)."""
-    clients_list = Client.query.order_by(Client.name.asc()).all()
+    # Plain row tuples: only the three columns, no ORM instances
+    rows = db.session.execute(
+        select(Client.id, Client.name, Client.email).order_by(Client.name.asc())
+    )
     return jsonify([{
-        'id': client.id,
-        'name': client.name,
-        'email': client.email
-    } for client in clients_list])
+        'id': client_id,
+        'name': name,
+        'email': email
+    } for client_id, name, email in rows])
 
 
@@ -1,98 +1,158 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, request
-from app.models import db, Invoice, Client, VatRate
+import itertools
+import time
+from functools import lru_cache
+from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app, has_app_context
+from app.models import db, Invoice, Client, VatRate, get_today
+from app.services.status_transitions import InvoiceStatusTransition
 from app.logging_config import get_logger
-from sqlalchemy import func, case
+from sqlalchemy import func, case, cast, and_, exists, select, bindparam, event, Date, Float
+from sqlalchemy.orm import Session, joinedload, raiseload
 from datetime import date, datetime, timedelta
-from decimal import Decimal
 
 logger = get_logger(__name__)
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# app.extensions key holding (today, expires_at, metrics)
+METRICS_CACHE_KEY = 'dashboard_metrics'
 
-@dashboard_bp.route('/')
-def overview():
-    """Overview/dashboard page with metrics from real data."""
-    today = date.today()
-    current_month_start = date(today.year, today.month, 1)
+
+def _days_between(dialect_name, start, end):
+    """SQL expression for the number of days from ``start`` to ``end``."""
+    if dialect_name == 'sqlite':
+        return func.julianday(end) - func.julianday(start)
+    # PostgreSQL: date - date yields an integer day count
+    return end - start
+
+
+@lru_cache(maxsize=None)
+def _overview_metrics_stmt(dialect_name):
+    """Build the dashboard aggregate SELECT once per dialect.
     
-    # Update overdue invoices first
-    updated_count = Invoice.update_overdue_invoices()
-    if updated_count > 0:
-        db.session.commit()
+    Only the ``month_start`` bind parameter varies between requests, so the
+    statement is constructed once and its compiled form is reused from the
+    engine's query cache.
+    """
+    # All metrics in a single round-trip using conditional aggregates;
+    # money sums are cast to float in SQL since the page only needs floats
+    is_paid = Invoice.status == 'makstud'
+    is_unpaid = Invoice.status.in_(['saadetud', 'tähtaeg ületatud'])
+    month_start = bindparam('month_start', type_=Date)
+    # Payment days per paid invoice (due_date - date), at least 1 day
+    days_diff = _days_between(dialect_name, Invoice.date, Invoice.due_date)
+    payment_days = case((days_diff < 1, 1), else_=days_diff)
+    
+    return select(
+        # 1. Revenue for current month (paid invoices only)
+        cast(func.coalesce(func.sum(case((and_(is_paid, Invoice.date >= month_start), Invoice.total))), 0), Float),
+        # 2. Total cash received (all paid invoices)
+        cast(func.coalesce(func.sum(case((is_paid, Invoice.total))), 0), Float),
+        # 3. Number of unpaid invoices (sent + overdue)
+        func.count(case((is_unpaid, 1))),
+        # 4. Average days to payment (calculated from paid invoices)
+        func.count(case((is_paid, 1))),
+        func.coalesce(func.sum(case((is_paid, payment_days))), 0),
+        # Total invoices
+        func.count(Invoice.id),
+        # Outstanding amount (unpaid invoices)
+        cast(func.coalesce(func.sum(case((is_unpaid, Invoice.total))), 0), Float),
+        # Total clients
+        select(func.count(Client.id)).scalar_subquery()
+    )
+
+
+def _compute_overview_metrics(today):
+    """Calculate dashboard metrics from real data."""
+    stmt = _overview_metrics_stmt(db.engine.dialect.name)
+    (revenue_month, cash_in, unpaid_count, paid_count, total_days,
+     total_invoices, outstanding, total_clients) = db.session.execute(
+        stmt, {'month_start': date(today.year, today.month, 1)}
+    ).one()
     
-    # Calculate metrics
-    # 1. Revenue for current month (paid invoices only)
-    revenue_month = db.session.query(func.sum(Invoice.total)).filter(
-        Invoice.date >= current_month_start,
-        Invoice.status.in_(['makstud'])
-    ).scalar() or Decimal('0')
-    
-    # 2. Total cash received (all paid invoices)
-    cash_in = db.session.query(func.sum(Invoice.total)).filter(
-        Invoice.status == 'makstud'
-    ).scalar() or Decimal('0')
-    
-    # 3. Number of unpaid invoices (sent + overdue)
-    unpaid_count = Invoice.query.filter(
-        Invoice.status.in_(['saadetud', 'tähtaeg ületatud'])
-    ).count()
-    
-    # 4. Average days to payment (calculated from paid invoices)
-    paid_invoices = Invoice.query.filter(Invoice.status == 'makstud').all()
-    if paid_invoices:
-        total_days = 0
-        for invoice in paid_invoices:
-            # Assume updated_at is when it was marked as paid
-            # For now, use a default of 14 days or calculate from due_date
-            days_diff = (invoice.due_date - invoice.date).days
-            total_days += max(1, days_diff)  # At least 1 day
-        avg_days = total_days // len(paid_invoices)
-    else:
-        avg_days = 0
-    
-    # Additional metrics for dashboard
-    # Total clients
-    total_clients = Client.query.count()
-    
-    # Total invoices
-    total_invoices = Invoice.query.count()
-    
-    # Outstanding amount (unpaid invoices)
-    outstanding = db.session.query(func.sum(Invoice.total)).filter(
-        Invoice.status.in_(['saadetud', 'tähtaeg ületatud'])
-    ).scalar() or Decimal('0')
-    
-    # Recent invoices for dashboard display
-    recent_invoices = Invoice.query.join(Client).order_by(
-        Invoice.date.desc()
-    ).limit(5).all()
-    
-    recent_invoices_data = []
-    for invoice in recent_invoices:
-        recent_invoices_data.append({
-            'no': invoice.number,
-            'date': invoice.date.strftime('%Y-%m-%d'),
-            'client': invoice.client.name,
-            'total': float(invoice.total),
-            'status': invoice.status,
-            'status_display': {
-                'mustand': 'Mustand',
-                'saadetud': 'Saadetud',
-                'makstud': 'Makstud',
-                'tähtaeg ületatud': 'Tähtaeg ületatud'
-            }.get(invoice.status, invoice.status)
-        })
-    
-    metrics = {
-        "revenue_month": float(revenue_month),
-        "cash_in": float(cash_in),
+    avg_days = int(total_days) // paid_count if paid_count else 0
+    
+    return {
+        "revenue_month": revenue_month,
+        "cash_in": cash_in,
         "unpaid": unpaid_count,
         "avg_days": avg_days,
         "total_clients": total_clients,
         "total_invoices": total_invoices,
-        "outstanding": float(outstanding)
+        "outstanding": outstanding
     }
+
+
+def _get_overview_metrics(today):
+    """Get dashboard metrics, cached per app for ``DASHBOARD_CACHE_TTL`` seconds."""
+    ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 0)
+    if not ttl:
+        return _compute_overview_metrics(today)
+    
+    now = time.monotonic()
+    cached = current_app.extensions.get(METRICS_CACHE_KEY)
+    if cached and cached[0] == today and cached[1] > now:
+        return cached[2]
+    
+    metrics = _compute_overview_metrics(today)
+    current_app.extensions[METRICS_CACHE_KEY] = (today, now + ttl, metrics)
+    return metrics
+
+
+def invalidate_overview_metrics():
+    """Drop cached dashboard metrics of the current app."""
+    if has_app_context():
+        current_app.extensions.pop(METRICS_CACHE_KEY, None)
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_metrics_on_flush(session, flush_context):
+    """Invalidate cached metrics when invoices or clients are written."""
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Invoice, Client)):
+            invalidate_overview_metrics()
+            return
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _invalidate_metrics_on_bulk_write(orm_execute_state):
+    """Invalidate cached metrics when a bulk UPDATE/DELETE changed invoices or clients."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in (Invoice, Client):
+        return None
+    
+    result = orm_execute_state.invoke_statement()
+    if result.rowcount:
+        invalidate_overview_metrics()
+    return result
+
+
+@dashboard_bp.route('/')
+def overview():
+    """Overview/dashboard page with metrics from real data."""
+    today = get_today()
+    
+    # Update overdue invoices first (throttled, see OVERDUE_UPDATE_INTERVAL)
+    Invoice.refresh_overdue_statuses()
+    
+    metrics = _get_overview_metrics(today)
+    
+    # Recent invoices for dashboard display; only the client is needed, any
+    # other relationship access would be an accidental per-row query
+    recent_invoices = Invoice.query.options(
+        joinedload(Invoice.client), raiseload('*')
+    ).order_by(Invoice.date.desc()).limit(5).all()
+    
+    status_names = InvoiceStatusTransition.STATUS_DISPLAY_NAMES
+    recent_invoices_data = [{
+        'no': invoice.number,
+        'date': invoice.date.strftime('%Y-%m-%d'),
+        'client': invoice.client.name,
+        'total': float(invoice.total),
+        'status': invoice.status,
+        'status_display': status_names.get(invoice.status, invoice.status)
+    } for invoice in recent_invoices]
     
     return render_template('overview.html', 
                          metrics=metrics, 
@@ -148,7 +208,7 @@ def settings():
 @dashboard_bp.route('/settings/vat-rates')
 def vat_rates():
     """VAT rates management page."""
-    vat_rates = VatRate.query.order_by(VatRate.rate.asc()).all()
+    vat_rates = VatRate.get_all_rates()
     return render_template('vat_rates.html', vat_rates=vat_rates)
 
 
@@ -191,12 +251,21 @@ def edit_vat_rate(vat_rate_id):
     form._vat_rate_id = vat_rate_id
     
     if form.validate_on_submit():
+        rate_changed = vat_rate.rate != form.rate.data
         vat_rate.name = form.name.data
         vat_rate.rate = form.rate.data
         vat_rate.description = form.description.data
         vat_rate.is_active = form.is_active.data
         
         try:
+            if rate_changed:
+                # Only drafts follow the new percentage; issued invoices keep
+                # the amounts the customer received
+                db.session.flush()
+                Invoice.recalculate_totals(
+                    Invoice.vat_rate_id == vat_rate.id,
+                    Invoice.status == 'mustand'
+                )
             db.session.commit()
             flash(f'KM määr "{vat_rate.name}" on edukalt uuendatud.', 'success')
             return redirect(url_for('dashboard.vat_rates'))
@@ -212,9 +281,9 @@ def delete_vat_rate(vat_rate_id):
     """Delete VAT rate."""
     vat_rate = VatRate.query.get_or_404(vat_rate_id)
     
-    # Check if VAT rate is used in any invoices
-    invoice_count = Invoice.query.filter_by(vat_rate_id=vat_rate_id).count()
-    if invoice_count > 0:
+    # Check if VAT rate is used in any invoices (EXISTS; counted only for the message)
+    if db.session.query(exists().where(Invoice.vat_rate_id == vat_rate_id)).scalar():
+        invoice_count = Invoice.query.filter_by(vat_rate_id=vat_rate_id).count()
         flash(f'KM määra "{vat_rate.name}" ei saa kustutada, kuna see on kasutusel {invoice_count} arvel.', 'warning')
         return redirect(url_for('dashboard.vat_rates'))
     
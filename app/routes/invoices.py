@@ -5,13 +5,65 @@ from app.services.numbering import generate_invoice_number
 from app.services.totals import calculate_invoice_totals, calculate_line_total
 from app.services.status_transitions import InvoiceStatusTransition
 from app.logging_config import get_logger
-from datetime import date, datetime
-from sqlalchemy import or_
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+from sqlalchemy import or_, func, cast, insert, select, literal, Float
+from sqlalchemy.orm import joinedload, lazyload
+from sqlalchemy.orm.attributes import set_committed_value
 
 logger = get_logger(__name__)
 
 invoices_bp = Blueprint('invoices', __name__)
 
+# Invoices shown per page in the invoices listing
+INVOICES_PER_PAGE = 50
+
+# One row of the invoices listing
+InvoiceRow = namedtuple('InvoiceRow', 'id no date due_date client client_id total status is_overdue')
+
+# Parsed filters of the invoices listing (None where not filtered)
+InvoiceFilters = namedtuple('InvoiceFilters', 'status client_id date_from date_to')
+
+
+def _parse_date(value):
+    """Parse a YYYY-MM-DD query parameter, returning None when empty or invalid."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=256)
+def _parse_filters(status, client_id, date_from, date_to):
+    """Parse the raw invoices listing filters; invalid values are ignored.
+    
+    A pure function of the query strings, so repeated filter combinations
+    (bookmarks, pager links) are answered from the cache.
+    """
+    return InvoiceFilters(
+        status=status or None,
+        client_id=int(client_id) if client_id.isascii() and client_id.isdigit() else None,
+        date_from=_parse_date(date_from),
+        date_to=_parse_date(date_to)
+    )
+
+
+def _complete_line_data(line_form):
+    """Return the posted data of a complete invoice line, or None.
+    
+    A line is complete with a description, quantity and unit price; the
+    nested form's data is read once.
+    """
+    line_data = line_form.data or {}
+    if ((line_data.get('description') or '').strip()
+            and line_data.get('qty') is not None
+            and line_data.get('unit_price') is not None):
+        return line_data
+    return None
+
 
 @invoices_bp.route('/invoices')
 def invoices():
@@ -19,8 +71,9 @@ def invoices():
     search_form = InvoiceSearchForm()
     
     # Populate client choices
-    clients = Client.query.order_by(Client.name.asc()).all()
-    search_form.client_id.choices = [('', 'Kõik')] + [(str(c.id), c.name) for c in clients]
+    search_form.client_id.choices = [('', 'Kõik')] + [
+        (str(client_id), name) for client_id, name in Client.get_choices()
+    ]
     
     # Get filter parameters
     status = request.args.get('status', '').strip()
@@ -28,67 +81,80 @@ def invoices():
     date_from = request.args.get('date_from', '').strip()
     date_to = request.args.get('date_to', '').strip()
     
-    # Build query
-    query = Invoice.query.join(Client)
-    
-    if status and status != '':
-        query = query.filter(Invoice.status == status)
-    
-    if client_id and client_id != '':
-        query = query.filter(Invoice.client_id == int(client_id))
-    
-    if date_from:
-        try:
-            from_date = datetime.strptime(date_from, '%Y-%m-%d').date()
-            query = query.filter(Invoice.date >= from_date)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            to_date = datetime.strptime(date_to, '%Y-%m-%d').date()
-            query = query.filter(Invoice.date <= to_date)
-        except ValueError:
-            pass
-    
-    # Update overdue status before displaying
-    updated_count = Invoice.update_overdue_invoices()
-    if updated_count > 0:
-        db.session.commit()
-    
-    invoices_list = query.order_by(Invoice.date.desc()).all()
-    
-    # Prepare invoice data
-    invoices_data = []
-    for invoice in invoices_list:
-        invoices_data.append({
-            'id': invoice.id,
-            'no': invoice.number,
-            'date': invoice.date.strftime('%Y-%m-%d'),
-            'due_date': invoice.due_date.strftime('%Y-%m-%d'),
-            'client': invoice.client.name,
-            'client_id': invoice.client_id,
-            'total': float(invoice.total),
-            'status': invoice.status,
-            'is_overdue': invoice.is_overdue
-        })
+    filters = _parse_filters(status, client_id, date_from, date_to)
+    
+    page = request.args.get('page', 1, type=int)
+    
+    # Build query; the filters only use invoice columns, so the client is
+    # joined just for the rows of the current page
+    query = Invoice.query
+    
+    if filters.status:
+        query = query.filter(Invoice.status == filters.status)
+    
+    if filters.client_id is not None:
+        query = query.filter(Invoice.client_id == filters.client_id)
+    
+    if filters.date_from:
+        query = query.filter(Invoice.date >= filters.date_from)
+    
+    if filters.date_to:
+        query = query.filter(Invoice.date <= filters.date_to)
+    
+    # Update overdue status before displaying (throttled, see OVERDUE_UPDATE_INTERVAL)
+    Invoice.refresh_overdue_statuses()
+    
+    # Summary cards cover all matching invoices; the count also sizes the pager
+    total_invoices, total_amount = query.with_entities(
+        func.count(Invoice.id),
+        cast(func.coalesce(func.sum(Invoice.total), 0), Float)
+    ).one()
+    pages = max(1, -(-total_invoices // INVOICES_PER_PAGE))
+    page = min(max(page, 1), pages)
+    
+    # Only the current page is loaded, and only the columns the table shows
+    rows = (query.join(Client)
+            .with_entities(Invoice.id, Invoice.number, Invoice.date, Invoice.due_date,
+                           Invoice.total, Invoice.status, Invoice.client_id, Client.name,
+                           Invoice.is_overdue.label('is_overdue'))
+            .order_by(Invoice.date.desc(), Invoice.id.desc())
+            .limit(INVOICES_PER_PAGE)
+            .offset((page - 1) * INVOICES_PER_PAGE)
+            .all())
+    
+    # Prepare invoice data (isoformat() is the same YYYY-MM-DD as strftime)
+    invoices_data = [InvoiceRow(
+        id=row.id,
+        no=row.number,
+        date=row.date.isoformat(),
+        due_date=row.due_date.isoformat(),
+        client=row.name,
+        client_id=row.client_id,
+        total=float(row.total),
+        status=row.status,
+        is_overdue=row.is_overdue
+    ) for row in rows]
     
     # Set form data
     search_form.status.data = status
     search_form.client_id.data = client_id
-    if date_from:
-        try:
-            search_form.date_from.data = datetime.strptime(date_from, '%Y-%m-%d').date()
-        except ValueError:
-            pass
-    if date_to:
-        try:
-            search_form.date_to.data = datetime.strptime(date_to, '%Y-%m-%d').date()
-        except ValueError:
-            pass
+    search_form.date_from.data = filters.date_from
+    search_form.date_to.data = filters.date_to
+    
+    summary = {'total': total_invoices, 'amount': total_amount}
+    pagination = {
+        'page': page,
+        'pages': pages,
+        'per_page': INVOICES_PER_PAGE,
+        # Current (valid) filters, carried over to the pager links; raw query
+        # keys are never forwarded to url_for()
+        'args': {key: value for key, value in filters._asdict().items() if value is not None}
+    }
     
     return render_template('invoices.html', 
                          invoices=invoices_data, 
+                         summary=summary,
+                         pagination=pagination,
                          search_form=search_form)
 
 
@@ -98,10 +164,9 @@ def new_invoice():
     form = InvoiceForm()
     
     # Populate client choices
-    clients = Client.query.order_by(Client.name.asc()).all()
-    form.client_id.choices = [(c.id, c.name) for c in clients]
+    form.client_id.choices = Client.get_choices()
     
-    if not clients:
+    if not form.client_id.choices:
         flash('Enne arve loomist tuleb lisada vähemalt üks klient.', 'warning')
         return redirect(url_for('clients.new_client'))
     
@@ -133,51 +198,18 @@ def new_invoice():
     
     if form.validate_on_submit():
         # Custom validation: check if form is valid and has at least one complete line
-        valid_lines = []
-        for line_form in form.lines.entries:
-            # Check description
-            has_description = (hasattr(line_form, 'description') and 
-                             hasattr(line_form.description, 'data') and
-                             line_form.description.data and 
-                             line_form.description.data.strip())
-            
-            # Check qty
-            has_qty = (hasattr(line_form, 'qty') and 
-                      hasattr(line_form.qty, 'data') and
-                      line_form.qty.data is not None)
-            
-            # Check unit_price
-            has_unit_price = (hasattr(line_form, 'unit_price') and 
-                             hasattr(line_form.unit_price, 'data') and
-                             line_form.unit_price.data is not None)
-            
-            if has_description and has_qty and has_unit_price:
-                valid_lines.append(line_form)
+        valid_lines = [line_data for line_data in map(_complete_line_data, form.lines.entries) if line_data]
         
         if len(valid_lines) == 0:
-            # Try accessing data via the .data attribute instead
-            for line_form in form.lines.entries:
-                try:
-                    data = line_form.data
-                    desc = data.get('description', '').strip() if data else ''
-                    qty = data.get('qty') if data else None
-                    price = data.get('unit_price') if data else None
-                    
-                    if desc and qty is not None and price is not None:
-                        valid_lines.append(line_form)
-                except Exception as e:
-                    logger.error(f"Error accessing line_form data: {e}")
-            
-            if len(valid_lines) == 0:
-                flash('Palun lisa vähemalt üks arve rida.', 'warning')
+            flash('Palun lisa vähemalt üks arve rida.', 'warning')
         
         if len(valid_lines) > 0:
-            # Use form invoice number (user can modify it)
-            invoice_number = form.number.data or generate_invoice_number()
+            # Use form invoice number (user can modify it; pre-filled above when empty)
+            invoice_number = form.number.data
         
             # Create invoice
-            # Get the selected VAT rate
-            selected_vat_rate = VatRate.query.get(form.vat_rate_id.data)
+            # Get the selected VAT rate (validated against the active rates loaded above)
+            selected_vat_rate = next((vr for vr in vat_rates if vr.id == form.vat_rate_id.data), None)
             
             invoice = Invoice(
                 number=invoice_number,
@@ -190,35 +222,32 @@ def new_invoice():
             )
             
             try:
-                db.session.add(invoice)
-                db.session.flush()  # Get invoice ID
+                # Invoice line rows (use valid_lines instead of form.lines)
+                line_rows = []
+                for line_data in valid_lines:
+                    line_rows.append({
+                        'description': line_data['description'],
+                        'qty': line_data['qty'],
+                        'unit_price': line_data['unit_price'],
+                        'line_total': calculate_line_total(line_data['qty'], line_data['unit_price'])
+                    })
                 
-                # Add invoice lines (use valid_lines instead of form.lines)
-                for line_form in valid_lines:
-                    # Use .data attribute to access the form data since FormField objects are corrupted
-                    line_data = line_form.data
-                    line_total = calculate_line_total(line_data['qty'], line_data['unit_price'])
-                    line = InvoiceLine(
-                        invoice_id=invoice.id,
-                        description=line_data['description'],
-                        qty=line_data['qty'],
-                        unit_price=line_data['unit_price'],
-                        line_total=line_total
-                    )
-                    db.session.add(line)
-                
-                db.session.flush()  # Ensure lines are saved
+                # Calculate totals from the line rows
+                calculate_invoice_totals(invoice, line_rows)
                 
-                # Calculate totals
-                calculate_invoice_totals(invoice)
+                db.session.add(invoice)
+                db.session.flush()
                 
+                # Insert all lines in one executemany, outside the unit of work
+                db.session.execute(insert(InvoiceLine),
+                                   [dict(row, invoice_id=invoice.id) for row in line_rows])
                 db.session.commit()
                 
                 flash(f'Arve "{invoice.number}" on edukalt loodud.', 'success')
-                logger.info(f"Invoice {invoice.number} created successfully with {len(valid_lines)} lines")
+                logger.info("Invoice %s created successfully with %d lines", invoice.number, len(valid_lines))
                 return redirect(url_for('invoices.view_invoice', invoice_id=invoice.id))
             except Exception as e:
-                logger.error(f"Error creating invoice: {str(e)}")
+                logger.exception("Error creating invoice")
                 db.session.rollback()
                 flash('Arve loomisel tekkis viga. Palun proovi uuesti.', 'danger')
     else:
@@ -228,20 +257,21 @@ def new_invoice():
     # Ensure at least one line form
     if not form.lines.entries:
         form.lines.append_entry()
-    return render_template('invoice_form.html', form=form, title='Uus arve', clients=clients, vat_rates=vat_rates)
+    return render_template('invoice_form.html', form=form, title='Uus arve', vat_rates=vat_rates)
 
 
 @invoices_bp.route('/invoices/<int:invoice_id>')
 def view_invoice(invoice_id):
     """View invoice details."""
-    invoice = Invoice.query.get_or_404(invoice_id)
+    # Lines are selectin-loaded; the client comes with the same SELECT
+    invoice = Invoice.get_or_404(invoice_id, joinedload(Invoice.client))
     return render_template('invoice_detail.html', invoice=invoice)
 
 
 @invoices_bp.route('/invoices/<int:invoice_id>/edit', methods=['GET', 'POST'])
 def edit_invoice(invoice_id):
     """Edit invoice."""
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice = Invoice.get_or_404(invoice_id)
     
     # Prevent editing paid invoices
     if invoice.status == 'makstud':
@@ -250,39 +280,42 @@ def edit_invoice(invoice_id):
     
     form = InvoiceForm(obj=invoice)
     
-    # Set invoice ID for unique validation
+    # Set invoice for unique/status validation
     form._invoice_id = invoice_id
+    form._invoice = invoice
     
     # Populate client choices
-    clients = Client.query.order_by(Client.name.asc()).all()
-    form.client_id.choices = [(c.id, c.name) for c in clients]
+    form.client_id.choices = Client.get_choices()
     
     # Populate VAT rate choices
     vat_rates = VatRate.get_active_rates()
     form.vat_rate_id.choices = [(vr.id, f"{vr.name} ({vr.rate}%)") for vr in vat_rates]
     
-    # Set current VAT rate
-    if invoice.vat_rate_id:
-        form.vat_rate_id.data = invoice.vat_rate_id
-    else:
-        # Fallback: try to find matching rate by value
-        matching_rate = VatRate.query.filter_by(rate=invoice.vat_rate, is_active=True).first()
-        if matching_rate:
-            form.vat_rate_id.data = matching_rate.id
-        elif vat_rates:
-            form.vat_rate_id.data = vat_rates[0].id
-    
-    # Populate existing lines
-    while len(form.lines) > 0:
-        form.lines.pop_entry()
-    
-    for line in invoice.lines:
-        line_form = form.lines.append_entry()
-        line_form.id.data = line.id
-        line_form.description.data = line.description
-        line_form.qty.data = line.qty
-        line_form.unit_price.data = line.unit_price
-        line_form.line_total.data = line.line_total
+    # Set current VAT rate (on submit the posted rate is kept)
+    if not form.is_submitted():
+        if invoice.vat_rate_id:
+            form.vat_rate_id.data = invoice.vat_rate_id
+        else:
+            # Fallback: try to find matching rate by value among the active rates
+            matching_rate = next((vr for vr in vat_rates if vr.rate == invoice.vat_rate), None)
+            if matching_rate:
+                form.vat_rate_id.data = matching_rate.id
+            elif vat_rates:
+                form.vat_rate_id.data = vat_rates[0].id
+    
+    # Populate existing lines (on submit the posted lines are kept)
+    # Lines are nested forms: FormField.id is the HTML id, the hidden field is .form.id
+    if not form.is_submitted():
+        while len(form.lines) > 0:
+            form.lines.pop_entry()
+        
+        for line in invoice.lines:
+            line_form = form.lines.append_entry().form
+            line_form.id.data = line.id
+            line_form.description.data = line.description
+            line_form.qty.data = line.qty
+            line_form.unit_price.data = line.unit_price
+            line_form.line_total.data = line.line_total
     
     # Add empty line if no lines exist
     if not form.lines.entries:
@@ -294,8 +327,8 @@ def edit_invoice(invoice_id):
         invoice.date = form.date.data
         invoice.due_date = form.due_date.data
         
-        # Update VAT rate
-        selected_vat_rate = VatRate.query.get(form.vat_rate_id.data)
+        # Update VAT rate (validated against the active rates loaded above)
+        selected_vat_rate = next((vr for vr in vat_rates if vr.id == form.vat_rate_id.data), None)
         invoice.vat_rate_id = form.vat_rate_id.data
         invoice.vat_rate = selected_vat_rate.rate if selected_vat_rate else invoice.vat_rate  # Keep existing if not found
         
@@ -303,50 +336,53 @@ def edit_invoice(invoice_id):
         
         try:
             # Update lines
-            existing_line_ids = [line.id for line in invoice.lines]
-            form_line_ids = [int(line_form.id.data) for line_form in form.lines.entries if line_form.id.data]
-            
-            # Delete removed lines
-            for line_id in existing_line_ids:
-                if line_id not in form_line_ids:
-                    line_to_delete = InvoiceLine.query.get(line_id)
-                    if line_to_delete:
-                        db.session.delete(line_to_delete)
+            line_forms = [entry.form for entry in form.lines.entries]
+            form_line_ids = {int(line_form.id.data) for line_form in line_forms if line_form.id.data}
             
-            # Update or create lines
-            for line_form in form.lines.entries:
-                if line_form.description.data and line_form.qty.data and line_form.unit_price.data:
-                    line_total = calculate_line_total(line_form.qty.data, line_form.unit_price.data)
-                    
-                    if line_form.id.data:
-                        # Update existing line
-                        line = InvoiceLine.query.get(int(line_form.id.data))
-                        if line and line.invoice_id == invoice.id:
-                            line.description = line_form.description.data
-                            line.qty = line_form.qty.data
-                            line.unit_price = line_form.unit_price.data
-                            line.line_total = line_total
-                    else:
-                        # Create new line
-                        line = InvoiceLine(
-                            invoice_id=invoice.id,
-                            description=line_form.description.data,
-                            qty=line_form.qty.data,
-                            unit_price=line_form.unit_price.data,
-                            line_total=line_total
-                        )
-                        db.session.add(line)
+            # Delete removed lines in a single statement
+            removed_line_ids = {line.id for line in invoice.lines} - form_line_ids
+            if removed_line_ids:
+                InvoiceLine.query.filter(InvoiceLine.id.in_(removed_line_ids)).delete(synchronize_session='evaluate')
+                # Keep the loaded collection in step, the totals are computed from it
+                set_committed_value(invoice, 'lines',
+                                    [line for line in invoice.lines if line.id not in removed_line_ids])
             
-            db.session.flush()
+            # Update or create lines; existing ones come from the loaded collection
+            lines_by_id = {line.id: line for line in invoice.lines}
+            for line_data in map(_complete_line_data, line_forms):
+                if not line_data:
+                    continue
+                line_total = calculate_line_total(line_data['qty'], line_data['unit_price'])
+                
+                if line_data['id']:
+                    # Update existing line
+                    line = lines_by_id.get(int(line_data['id']))
+                    if line:
+                        line.description = line_data['description']
+                        line.qty = line_data['qty']
+                        line.unit_price = line_data['unit_price']
+                        line.line_total = line_total
+                else:
+                    # Create new line (through the collection, so the totals include it)
+                    invoice.lines.append(InvoiceLine(
+                        description=line_data['description'],
+                        qty=line_data['qty'],
+                        unit_price=line_data['unit_price'],
+                        line_total=line_total
+                    ))
             
-            # Recalculate totals
+            # Recalculate totals from the in-memory lines
             calculate_invoice_totals(invoice)
             
+            # One flush at commit: changed lines go out as a single executemany
+            # UPDATE, new lines as one INSERT. The number is read beforehand so
+            # the expired invoice is not reloaded just for the message.
+            invoice_number = invoice.number
             db.session.commit()
-            flash(f'Arve "{invoice.number}" on edukalt uuendatud.', 'success')
-            return redirect(url_for('invoices.view_invoice', invoice_id=invoice.id))
+            flash(f'Arve "{invoice_number}" on edukalt uuendatud.', 'success')
+            return redirect(url_for('invoices.view_invoice', invoice_id=invoice_id))
         except Exception as e:
-            logger.error(f"Error updating invoice {invoice_id}: {str(e)}")
+            logger.exception("Error updating invoice %s", invoice_id)
             db.session.rollback()
             flash('Arve uuendamisel tekkis viga. Palun proovi uuesti.', 'danger')
     
@@ -356,7 +392,7 @@ def edit_invoice(invoice_id):
 @invoices_bp.route('/invoices/<int:invoice_id>/delete', methods=['POST'])
 def delete_invoice(invoice_id):
     """Delete invoice."""
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice = Invoice.get_or_404(invoice_id)
     
     # Prevent deleting paid invoices
     if invoice.status == 'makstud':
@@ -370,7 +406,7 @@ def delete_invoice(invoice_id):
         flash(f'Arve "{invoice_number}" on edukalt kustutatud.', 'success')
         return redirect(url_for('invoices.invoices'))
     except Exception as e:
-        logger.error(f"Error deleting invoice {invoice_id}: {str(e)}")
+        logger.exception("Error deleting invoice %s", invoice_id)
         db.session.rollback()
         flash('Arve kustutamisel tekkis viga. Palun proovi uuesti.', 'danger')
         return redirect(url_for('invoices.view_invoice', invoice_id=invoice_id))
@@ -379,7 +415,7 @@ def delete_invoice(invoice_id):
 @invoices_bp.route('/invoices/<int:invoice_id>/status/<new_status>', methods=['POST'])
 def change_status(invoice_id, new_status):
     """Change invoice status using the status transition service."""
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice = Invoice.get_or_404(invoice_id)
     
     try:
         # Use the status transition service
@@ -392,7 +428,7 @@ def change_status(invoice_id, new_status):
             flash(message, 'warning')
             
     except Exception as e:
-        logger.error(f"Error changing status for invoice {invoice_id} to {new_status}: {str(e)}")
+        logger.exception("Error changing status for invoice %s to %s", invoice_id, new_status)
         db.session.rollback()
         flash('Staatuse muutmisel tekkis viga. Palun proovi uuesti.', 'danger')
     
@@ -402,7 +438,8 @@ def change_status(invoice_id, new_status):
 @invoices_bp.route('/invoices/<int:invoice_id>/duplicate', methods=['POST'])
 def duplicate_invoice(invoice_id):
     """Duplicate invoice."""
-    original = Invoice.query.get_or_404(invoice_id)
+    # The lines are copied in SQL, so they are not loaded with the original
+    original = Invoice.get_or_404(invoice_id, lazyload(Invoice.lines))
     
     try:
         # Generate new invoice number
@@ -420,29 +457,23 @@ def duplicate_invoice(invoice_id):
         )
         
         db.session.add(duplicate)
-        db.session.flush()  # Get invoice ID
-        
-        # Duplicate invoice lines
-        for original_line in original.lines:
-            line = InvoiceLine(
-                invoice_id=duplicate.id,
-                description=original_line.description,
-                qty=original_line.qty,
-                unit_price=original_line.unit_price,
-                line_total=original_line.line_total
-            )
-            db.session.add(line)
-        
         db.session.flush()
         
-        # Calculate totals
-        calculate_invoice_totals(duplicate)
+        # Duplicate invoice lines with a single INSERT ... SELECT
+        line_columns = ['invoice_id', 'description', 'qty', 'unit_price', 'line_total']
+        db.session.execute(insert(InvoiceLine).from_select(line_columns, select(
+            literal(duplicate.id), InvoiceLine.description, InvoiceLine.qty,
+            InvoiceLine.unit_price, InvoiceLine.line_total
+        ).where(InvoiceLine.invoice_id == original.id).order_by(InvoiceLine.id)))
         
+        # Calculate totals from the copied lines (summed in SQL, see calculate_invoice_totals)
+        db.session.expire(duplicate, ['lines'])
+        calculate_invoice_totals(duplicate)
         db.session.commit()
         flash(f'Arve on edukalt dubleeritud uue numbriga "{new_number}".', 'success')
         return redirect(url_for('invoices.view_invoice', invoice_id=duplicate.id))
     except Exception as e:
-        logger.error(f"Error duplicating invoice {invoice_id}: {str(e)}")
+        logger.exception("Error duplicating invoice %s", invoice_id)
         db.session.rollback()
         flash('Arve dubleerimisel tekkis viga. Palun proovi uuesti.', 'danger')
         return redirect(url_for('invoices.view_invoice', invoice_id=invoice_id))
@@ -451,7 +482,7 @@ def duplicate_invoice(invoice_id):
 @invoices_bp.route('/invoices/<int:invoice_id>/email', methods=['POST'])
 def email_invoice(invoice_id):
     """Send invoice via email."""
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice = Invoice.get_or_404(invoice_id, joinedload(Invoice.client))
     
     # Check if client has email
     if not invoice.client.email:
@@ -468,7 +499,7 @@ def email_invoice(invoice_id):
         flash(f'Arve "{invoice.number}" on edukalt saadetud e-mailile {invoice.client.email}.', 'success')
         return redirect(url_for('invoices.view_invoice', invoice_id=invoice_id))
     except Exception as e:
-        logger.error(f"Error sending invoice {invoice_id} via email: {str(e)}")
+        logger.exception("Error sending invoice %s via email", invoice_id)
         db.session.rollback()
         flash('Arve saatmisel tekkis viga. Palun proovi uuesti.', 'danger')
         return redirect(url_for('invoices.view_invoice', invoice_id=invoice_id))
\ No newline at end of file
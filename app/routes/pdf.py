@@ -1,66 +1,154 @@
-from flask import Blueprint, render_template, request, send_file, abort
-from datetime import date
-from io import BytesIO
-from weasyprint import HTML, CSS
-from app.models import Invoice, CompanySettings
+import hashlib
+from collections import OrderedDict
+from flask import Blueprint, Response, request, abort, current_app
+from functools import lru_cache
+from sqlalchemy.orm import joinedload
+from app.models import Invoice, CompanySettings, get_today
 from app.logging_config import get_logger
 
 logger = get_logger(__name__)
 
 pdf_bp = Blueprint('pdf', __name__)
 
+# app.extensions key holding the OrderedDict of rendered PDFs (see _cached_pdf)
+PDF_CACHE_KEY = 'invoice_pdfs'
+
+# PDF templates available as templates/pdf/invoice_<name>.html
+PDF_TEMPLATES = frozenset(('standard', 'modern', 'elegant'))
+
+
+@lru_cache(maxsize=None)
+def _font_config():
+    """WeasyPrint font configuration, created once per process.
+    
+    Font discovery is identical for every invoice, so the configuration is
+    shared instead of being rebuilt by each ``write_pdf`` call.
+    """
+    from weasyprint.text.fonts import FontConfiguration
+    return FontConfiguration()
+
+
+def _cached_pdf(key, render):
+    """Return PDF bytes for ``key``, calling ``render()`` on a cache miss.
+    
+    ``key`` is the hash of the document's HTML, so an edit made by any
+    process yields a new key and outdated entries simply age out. The
+    newest ``PDF_CACHE_SIZE`` documents are kept per app; 0 disables caching.
+    """
+    size = current_app.config.get('PDF_CACHE_SIZE', 0)
+    if not size:
+        return render()
+    
+    cache = current_app.extensions.setdefault(PDF_CACHE_KEY, OrderedDict())
+    pdf_bytes = cache.get(key)
+    if pdf_bytes is not None:
+        cache.move_to_end(key)
+        return pdf_bytes
+    
+    pdf_bytes = render()
+    cache[key] = pdf_bytes
+    while len(cache) > size:
+        cache.popitem(last=False)
+    return pdf_bytes
+
+
+def _render_invoice_html(template_file, invoice, company_settings, today):
+    """Render a PDF template straight from the Jinja environment.
+    
+    The PDF templates only use the variables passed here, so Flask's
+    context processors (CSRF token, navigation) are skipped. Compiled
+    templates are still cached (and auto-reloaded) by the environment.
+    """
+    template = current_app.jinja_env.get_template(template_file)
+    return template.render(invoice=invoice, company=company_settings, today=today)
+
+
+def _resolve_template(template, args, company_settings):
+    """Pick the PDF template name for a request.
+    
+    Priority: URL segment, ``?template=``, ``?style=`` (kept for backwards
+    compatibility), then the company default; unknown names fall back to
+    the default and finally to 'standard'.
+    """
+    if template in PDF_TEMPLATES:
+        return template
+    template = template or args.get('template') or args.get('style')
+    if template not in PDF_TEMPLATES:
+        template = company_settings.default_pdf_template
+    return template if template in PDF_TEMPLATES else 'standard'
+
+
+def _html_etag(html):
+    """ETag of a rendered invoice document.
+    
+    Derived from the HTML itself, so it changes with anything the template
+    prints (client, lines, company settings, date), whoever wrote it.
+    """
+    return hashlib.sha1(html.encode()).hexdigest()
+
+
+def _not_modified(etag):
+    """Return a 304 response if the client already has ``etag``, else None."""
+    if not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def _set_validators(response, etag):
+    """Mark an invoice document response as private and revalidated by ETag."""
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
 
 @pdf_bp.route('/invoice/<int:id>/pdf')
 @pdf_bp.route('/invoice/<int:id>/pdf/<template>')
 def invoice_pdf(id, template=None):
     """Generate PDF for invoice with specified template."""
-    invoice = Invoice.query.get_or_404(id)
+    # The templates read the client; lines are selectin-loaded with the invoice
+    invoice = Invoice.get_or_404(id, joinedload(Invoice.client))
     
     # Get company settings for default template
     company_settings = CompanySettings.get_settings()
     
     # Determine template to use (priority: URL param > query param > settings default)
-    if not template:
-        # Support both ?template= and ?style= parameters for backwards compatibility
-        if 'style' in request.args:
-            template = request.args.get('style')
-        elif 'template' in request.args:
-            template = request.args.get('template')
-        else:
-            # Use default from settings
-            template = company_settings.default_pdf_template or 'standard'
-    
-    # Validate template
-    valid_templates = ['standard', 'modern', 'elegant']
-    if template not in valid_templates:
-        template = company_settings.default_pdf_template or 'standard'
+    template = _resolve_template(template, request.args, company_settings)
     
     # Select template file
     template_file = f'pdf/invoice_{template}.html'
     
+    today = get_today()
+    
     try:
-        # Render HTML with invoice data and company settings
-        html = render_template(
-            template_file, 
-            invoice=invoice, 
-            company=company_settings,
-            today=date.today()
-        )
+        # Render HTML with invoice data and company settings; it is cheap next
+        # to WeasyPrint and identifies the document exactly
+        html = _render_invoice_html(template_file, invoice, company_settings, today)
+        etag = _html_etag(html)
+        
+        # The client already has this version: skip PDF generation altogether
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        
+        def render():
+            # Generate PDF with WeasyPrint (imported lazily, it is by far the heaviest dependency)
+            from weasyprint import HTML
+            html_doc = HTML(string=html)
+            return html_doc.write_pdf(font_config=_font_config())
         
-        # Generate PDF with WeasyPrint
-        html_doc = HTML(string=html)
-        pdf_bytes = html_doc.write_pdf()
+        pdf_bytes = _cached_pdf(etag, render)
         
         # Create filename
         filename = f"invoice_{invoice.number}_{template}.pdf"
         
-        pdf_buffer = BytesIO(pdf_bytes)
-        return send_file(
-            pdf_buffer, 
-            mimetype='application/pdf', 
-            as_attachment=True,
-            download_name=filename
-        )
+        # The whole document is already in memory, so it is sent as one body
+        # instead of streaming a BytesIO through send_file
+        response = Response(pdf_bytes, mimetype='application/pdf')
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+        return _set_validators(response, etag)
         
     except Exception as e:
         logger.error(f"PDF generation error for invoice {id}: {str(e)}", exc_info=True)
@@ -71,31 +159,29 @@ def invoice_pdf(id, template=None):
 @pdf_bp.route('/invoice/<int:id>/preview/<template>')
 def invoice_preview(id, template=None):
     """Preview invoice HTML before PDF generation."""
-    invoice = Invoice.query.get_or_404(id)
+    # The templates read the client; lines are selectin-loaded with the invoice
+    invoice = Invoice.get_or_404(id, joinedload(Invoice.client))
     
     # Get company settings for default template
     company_settings = CompanySettings.get_settings()
     
-    # Determine template to use
-    if not template:
-        template = request.args.get('template') or request.args.get('style') or company_settings.default_pdf_template or 'standard'
-    
-    # Validate template
-    valid_templates = ['standard', 'modern', 'elegant']
-    if template not in valid_templates:
-        template = company_settings.default_pdf_template or 'standard'
+    # Determine template to use (priority: URL param > query param > settings default)
+    template = _resolve_template(template, request.args, company_settings)
     
     # Select template file
     template_file = f'pdf/invoice_{template}.html'
     
+    today = get_today()
+    
     try:
-        # Render and return HTML directly with company settings
-        return render_template(
-            template_file, 
-            invoice=invoice, 
-            company=company_settings,
-            today=date.today()
-        )
+        # Render HTML directly with company settings; a matching ETag only
+        # saves sending it
+        html = _render_invoice_html(template_file, invoice, company_settings, today)
+        etag = _html_etag(html)
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        return _set_validators(Response(html, mimetype='text/html'), etag)
     except Exception as e:
         logger.error(f"Preview generation error for invoice {id}: {str(e)}", exc_info=True)
         abort(500)
@@ -106,7 +192,7 @@ def invoice_pdf_all_templates(id):
     """Generate PDFs in all templates and return as zip file (future enhancement)."""
     # This could be implemented to generate all three templates
     # and return them as a zip file for comparison
-    invoice = Invoice.query.get_or_404(id)
+    Invoice.get_or_404(id)
     
     # For now, redirect to standard template
     return invoice_pdf(id, 'standard')
\ No newline at end of file
@@ -11,7 +11,11 @@ class InvoiceStatusTransition:
     PAID = 'makstud'
     OVERDUE = 'tähtaeg ületatud'
     
-    VALID_STATUSES = [DRAFT, SENT, PAID, OVERDUE]
+    # Immutable, so get_valid_transitions() can hand out the shared tuple
+    VALID_STATUSES = (DRAFT, SENT, PAID, OVERDUE)
+    
+    # Statuses a paid invoice may not return to
+    UNPAID_STATUSES = frozenset((DRAFT, SENT, OVERDUE))
     
     # Status messages in Estonian
     STATUS_MESSAGES = {
@@ -21,6 +25,22 @@ class InvoiceStatusTransition:
         OVERDUE: 'Arve on märgitud tähtaja ületanud.'
     }
     
+    # Status display names in Estonian
+    STATUS_DISPLAY_NAMES = {
+        DRAFT: 'Mustand',
+        SENT: 'Saadetud',
+        PAID: 'Makstud',
+        OVERDUE: 'Tähtaeg ületatud'
+    }
+    
+    # Status badge CSS classes
+    STATUS_CSS_CLASSES = {
+        DRAFT: 'badge-secondary',
+        SENT: 'badge-primary',
+        PAID: 'badge-success',
+        OVERDUE: 'badge-danger'
+    }
+    
     @classmethod
     def can_transition_to(cls, current_status, new_status):
         """
@@ -42,7 +62,7 @@ class InvoiceStatusTransition:
             return True, None
         
         # Paid invoices cannot be changed back to unpaid status
-        if current_status == cls.PAID and new_status in [cls.DRAFT, cls.SENT, cls.OVERDUE]:
+        if current_status == cls.PAID and new_status in cls.UNPAID_STATUSES:
             return False, 'Makstud arveid ei saa tagasi maksmata staatusesse muuta.'
         
         return True, None
@@ -121,7 +141,7 @@ class InvoiceStatusTransition:
             current_status: Current invoice status
             
         Returns:
-            list: List of valid status transitions
+            list|tuple: Valid status transitions (do not modify)
         """
         if current_status == cls.PAID:
             # Paid invoices cannot be changed to unpaid statuses
@@ -140,13 +160,7 @@ class InvoiceStatusTransition:
         Returns:
             str: Display name
         """
-        display_names = {
-            cls.DRAFT: 'Mustand',
-            cls.SENT: 'Saadetud',
-            cls.PAID: 'Makstud',
-            cls.OVERDUE: 'Tähtaeg ületatud'
-        }
-        return display_names.get(status, status)
+        return cls.STATUS_DISPLAY_NAMES.get(status, status)
     
     @classmethod
     def get_status_css_class(cls, status):
@@ -159,10 +173,4 @@ class InvoiceStatusTransition:
         Returns:
             str: CSS class name
         """
-        css_classes = {
-            cls.DRAFT: 'badge-secondary',
-            cls.SENT: 'badge-primary', 
-            cls.PAID: 'badge-success',
-            cls.OVERDUE: 'badge-danger'
-        }
-        return css_classes.get(status, 'badge-light')
\ No newline at end of file
+        return cls.STATUS_CSS_CLASSES.get(status, 'badge-light')
\ No newline at end of file
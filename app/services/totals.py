@@ -1,6 +1,26 @@
 from decimal import Decimal, ROUND_HALF_UP
 
 
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+HUNDRED = Decimal('100')
+
+
+def _to_decimal(value):
+    """
+    Convert a number to Decimal, skipping the string round-trip for Decimals.
+    
+    Args:
+        value: Amount (Decimal, float, int or numeric string)
+    
+    Returns:
+        Decimal: The amount as a Decimal
+    """
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
 def calculate_line_total(qty, unit_price):
     """
     Calculate total for an invoice line.
@@ -13,13 +33,13 @@ def calculate_line_total(qty, unit_price):
         Decimal: Line total rounded to 2 decimal places
     """
     if qty is None or unit_price is None:
-        return Decimal('0.00')
+        return ZERO
     
-    qty = Decimal(str(qty))
-    unit_price = Decimal(str(unit_price))
+    qty = _to_decimal(qty)
+    unit_price = _to_decimal(unit_price)
     
     total = qty * unit_price
-    return total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    return total.quantize(CENT, rounding=ROUND_HALF_UP)
 
 
 def calculate_subtotal(lines):
@@ -27,17 +47,22 @@ def calculate_subtotal(lines):
     Calculate subtotal from invoice lines.
     
     Args:
-        lines: List of invoice lines (each should have line_total attribute)
+        lines: List of invoice lines (each should have line_total attribute),
+            or line row dicts with a 'line_total' key
     
     Returns:
         Decimal: Subtotal rounded to 2 decimal places
     """
-    subtotal = Decimal('0.00')
+    subtotal = ZERO
     for line in lines:
-        if hasattr(line, 'line_total') and line.line_total:
-            subtotal += Decimal(str(line.line_total))
-    
-    return subtotal.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        if isinstance(line, dict):
+            line_total = line.get('line_total')
+        else:
+            line_total = getattr(line, 'line_total', None)
+        if line_total:
+            subtotal += _to_decimal(line_total)
+    
+    return subtotal.quantize(CENT, rounding=ROUND_HALF_UP)
 
 
 def calculate_vat_amount(subtotal, vat_rate):
@@ -52,13 +77,13 @@ def calculate_vat_amount(subtotal, vat_rate):
         Decimal: VAT amount rounded to 2 decimal places
     """
     if subtotal is None or vat_rate is None:
-        return Decimal('0.00')
+        return ZERO
     
-    subtotal = Decimal(str(subtotal))
-    vat_rate = Decimal(str(vat_rate))
+    subtotal = _to_decimal(subtotal)
+    vat_rate = _to_decimal(vat_rate)
     
-    vat_amount = subtotal * (vat_rate / Decimal('100'))
-    return vat_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    vat_amount = subtotal * (vat_rate / HUNDRED)
+    return vat_amount.quantize(CENT, rounding=ROUND_HALF_UP)
 
 
 def calculate_total(subtotal, vat_amount):
@@ -73,29 +98,38 @@ def calculate_total(subtotal, vat_amount):
         Decimal: Total amount rounded to 2 decimal places
     """
     if subtotal is None:
-        subtotal = Decimal('0.00')
+        subtotal = ZERO
     if vat_amount is None:
-        vat_amount = Decimal('0.00')
+        vat_amount = ZERO
     
-    subtotal = Decimal(str(subtotal))
-    vat_amount = Decimal(str(vat_amount))
+    subtotal = _to_decimal(subtotal)
+    vat_amount = _to_decimal(vat_amount)
     
     total = subtotal + vat_amount
-    return total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    return total.quantize(CENT, rounding=ROUND_HALF_UP)
 
 
-def calculate_invoice_totals(invoice):
+def calculate_invoice_totals(invoice, lines=None):
     """
     Calculate all totals for an invoice and update the invoice object.
     
+    If the lines collection of a saved invoice is not loaded, the subtotal
+    is summed by the database instead of loading every line.
+    
     Args:
-        invoice: Invoice object with lines relationship loaded
+        invoice: Invoice object
+        lines: Lines to total instead of invoice.lines (e.g. row dicts that
+            are inserted separately)
     
     Returns:
         dict: Dictionary with subtotal, vat_amount, and total
     """
     # Calculate subtotal from lines
-    subtotal = calculate_subtotal(invoice.lines)
+    stored_subtotal = invoice.stored_lines_subtotal() if lines is None else None
+    if stored_subtotal is not None:
+        subtotal = _to_decimal(stored_subtotal).quantize(CENT, rounding=ROUND_HALF_UP)
+    else:
+        subtotal = calculate_subtotal(invoice.lines if lines is None else lines)
     
     # Calculate VAT amount
     vat_amount = calculate_vat_amount(subtotal, invoice.vat_rate)
@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration for BilliPocket production deployment.
+
+Usage: gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:5010')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+
+# Import the application once in the master process; workers inherit the
+# loaded modules copy-on-write instead of each importing them again.
+# create_app() opens no database connections, so forking afterwards is safe.
+preload_app = True
+
+
+def when_ready(server):
+    """Import WeasyPrint in the master so workers share it as well.
+
+    The app imports it lazily (it is the heaviest dependency), which would
+    otherwise happen separately in every worker on its first PDF.
+    """
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError) as e:
+        server.log.warning("WeasyPrint could not be preloaded: %s", e)
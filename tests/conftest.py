@@ -9,12 +9,16 @@ This module provides:
 - Database setup and cleanup
 """
 
+import contextlib
 import pytest
 import tempfile
 import os
 from datetime import date, timedelta
 from decimal import Decimal
 
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
 from app import create_app
 from app.models import db, Client, Invoice, InvoiceLine
 from app.config import Config
@@ -26,40 +30,97 @@ class TestConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False  # Disable CSRF for testing
     SECRET_KEY = 'test-secret-key-for-testing-only'
+    DASHBOARD_CACHE_TTL = 0  # Test data is rolled back between tests
+    OVERDUE_UPDATE_INTERVAL = 0
+    PDF_CACHE_SIZE = 0
+
+
+def _enable_sqlite_savepoints(engine):
+    """Let pysqlite run SAVEPOINTs inside an explicit outer transaction.
+    
+    pysqlite issues its own BEGIN lazily and commits around DDL, which breaks
+    nested transactions; hand transaction control to SQLAlchemy instead.
+    """
+    @event.listens_for(engine, 'connect')
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+    
+    @event.listens_for(engine, 'begin')
+    def _emit_begin(conn):
+        conn.exec_driver_sql('BEGIN')
 
 
 @pytest.fixture(scope='session')
 def app():
-    """Create Flask application for testing."""
-    app = create_app()
-    app.config.from_object(TestConfig)
+    """Create Flask application for testing; the schema is created once."""
+    app = create_app(config_obj=TestConfig)
     
     with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            _enable_sqlite_savepoints(db.engine)
         db.create_all()
         yield app
         db.drop_all()
 
 
 @pytest.fixture(scope='function')
-def client(app):
-    """Flask test client."""
+def client(app, app_context):
+    """Flask test client; its requests run inside the test's transaction."""
     return app.test_client()
 
 
 @pytest.fixture(scope='function')
 def app_context(app):
-    """Application context for testing."""
+    """Application context whose database changes are rolled back after the test.
+    
+    The test runs inside an outer transaction on a single connection; session
+    commits (including those made by request handlers) only release SAVEPOINTs,
+    so teardown is one ROLLBACK instead of dropping and recreating the tables.
+    """
     with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        app_session = db.session
+        db.session = scoped_session(
+            sessionmaker(bind=connection, join_transaction_mode='create_savepoint',
+                         query_cls=db.Query),
+            scopefunc=app_session.registry.scopefunc
+        )
+        
         yield app
+        
+        db.session.remove()
+        db.session = app_session
+        transaction.rollback()
+        connection.close()
 
 
 @pytest.fixture(scope='function')
 def db_session(app_context):
     """Database session for testing."""
-    db.create_all()
-    yield db.session
-    db.session.rollback()
-    db.drop_all()
+    return db.session
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager recording the SQL statements executed on a connection.
+    
+    Usage: ``with count_queries(db_session.connection()) as queries: ...``
+    """
+    @contextlib.contextmanager
+    def counter(connection):
+        queries = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            queries.append(statement)
+        
+        event.listen(connection, 'before_cursor_execute', record)
+        try:
+            yield queries
+        finally:
+            event.remove(connection, 'before_cursor_execute', record)
+    
+    return counter
 
 
 @pytest.fixture
@@ -322,29 +383,4 @@ def invoice_number_test_data():
         'existing_numbers': ['2025-0001', '2025-0002', '2025-0005'],
         'expected_next': '2025-0006',
         'previous_year_numbers': ['2024-0001', '2024-0099']
-    }
-
-
-@pytest.fixture
-def vat_calculation_test_cases():
-    """Test cases for VAT calculations with Estonian VAT rate."""
-    return [
-        {
-            'subtotal': Decimal('100.00'),
-            'vat_rate': Decimal('22.00'),
-            'expected_vat': Decimal('22.00'),
-            'expected_total': Decimal('122.00')
-        },
-        {
-            'subtotal': Decimal('344.26'),
-            'vat_rate': Decimal('22.00'),
-            'expected_vat': Decimal('75.74'),  # Rounded
-            'expected_total': Decimal('420.00')
-        },
-        {
-            'subtotal': Decimal('50.50'),
-            'vat_rate': Decimal('22.00'),
-            'expected_vat': Decimal('11.11'),
-            'expected_total': Decimal('61.61')
-        }
-    ]
\ No newline at end of file
+    }
\ No newline at end of file
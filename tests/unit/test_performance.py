@@ -187,6 +187,37 @@ class TestCalculationPerformance:
         assert invoice.subtotal > 0
         assert invoice.total > invoice.subtotal
     
+    def test_large_invoice_calculation_performance(self, db_session):
+        """Test calculation performance for an invoice with 10 000 lines."""
+        from sqlalchemy import insert
+        
+        factory = TestDataFactory(db_session)
+        client = factory.create_client()
+        invoice = factory.create_invoice(client=client)
+        
+        # Seed lines with one executemany INSERT; the ORM is not under test here
+        db_session.execute(insert(InvoiceLine), [
+            {
+                'invoice_id': invoice.id,
+                'description': f'Rida {i}',
+                'qty': Decimal('2.00'),
+                'unit_price': Decimal('5.00'),
+                'line_total': Decimal('10.00')
+            }
+            for i in range(10_000)
+        ])
+        db_session.commit()
+        
+        start_time = time.time()
+        
+        calculate_invoice_totals(invoice)
+        
+        end_time = time.time()
+        calc_time = end_time - start_time
+        
+        assert calc_time < 1.0, f"Calculation for 10000 lines took {calc_time:.3f}s (should be < 1s)"
+        assert invoice.subtotal == Decimal('100000.00')
+    
     def test_bulk_calculation_performance(self, db_session):
         """Test bulk calculation performance."""
         factory = TestDataFactory(db_session)
@@ -41,6 +41,24 @@ class TestClientRoutes:
         assert sample_client.name.encode() in response.data
         assert sample_client_2.name.encode() in response.data
     
+    def test_clients_list_paginated(self, client, db_session):
+        """Test clients list is split into pages."""
+        from app.routes.clients import CLIENTS_PER_PAGE
+        
+        db_session.add_all([Client(name=f'Klient {i:03d}') for i in range(CLIENTS_PER_PAGE + 5)])
+        db_session.commit()
+        
+        response = client.get('/clients')
+        assert response.status_code == 200
+        assert b'Klient 000' in response.data
+        assert f'Klient {CLIENTS_PER_PAGE:03d}'.encode() not in response.data
+        assert 'Lehekülg 1 / '.encode() in response.data
+        
+        response = client.get('/clients?page=2')
+        assert response.status_code == 200
+        assert f'Klient {CLIENTS_PER_PAGE:03d}'.encode() in response.data
+        assert b'Klient 000' not in response.data
+    
     def test_client_new_get(self, client, app_context):
         """Test GET /clients/new - show new client form."""
         response = client.get('/clients/new')
@@ -169,6 +187,49 @@ class TestInvoiceRoutes:
         response = client.get('/invoices?date_from=2025-08-01&date_to=2025-08-31')
         assert response.status_code == 200
     
+    def test_invoices_list_invalid_filters_ignored(self, client, db_session):
+        """Test malformed filter values are ignored instead of failing."""
+        response = client.get('/invoices?client_id=abc&date_from=2025-13-01&date_to=x')
+        assert response.status_code == 200
+        
+        # str.isdigit() accepts digits that int() rejects
+        response = client.get('/invoices?client_id=²')
+        assert response.status_code == 200
+    
+    def test_invoices_list_paginated(self, client, db_session, sample_client):
+        """Test invoices list is split into pages that keep the filters."""
+        from app.routes.invoices import INVOICES_PER_PAGE
+        
+        db_session.add_all([
+            Invoice(number=f'2024-{i:04d}', client_id=sample_client.id,
+                    date=date(2024, 1, 1) + timedelta(days=i),
+                    due_date=date.today() + timedelta(days=14), status='saadetud')
+            for i in range(INVOICES_PER_PAGE + 5)
+        ])
+        db_session.commit()
+        
+        newest = f'2024-{INVOICES_PER_PAGE + 4:04d}'.encode()
+        oldest = b'2024-0000'
+        
+        response = client.get('/invoices?status=saadetud')
+        assert response.status_code == 200
+        assert newest in response.data
+        assert oldest not in response.data
+        assert b'page=2&amp;status=saadetud' in response.data
+        
+        response = client.get('/invoices?status=saadetud&page=2')
+        assert response.status_code == 200
+        assert oldest in response.data
+        assert newest not in response.data
+        
+        # Only the filters the view reads reach url_for(), not arbitrary keys
+        response = client.get('/invoices?status=saadetud&_method=POST'
+                              '&_external=1&_anchor=x&foo=bar')
+        assert response.status_code == 200
+        assert b'page=2&amp;status=saadetud"' in response.data
+        assert b'foo=bar' not in response.data
+        assert b'#x"' not in response.data
+    
     def test_invoice_new_get(self, client, app_context, sample_client):
         """Test GET /invoices/new - show new invoice form."""
         VatRate.create_default_rates()
@@ -266,6 +327,69 @@ class TestInvoiceRoutes:
         db.session.refresh(sample_invoice)
         assert sample_invoice.due_date.strftime('%Y-%m-%d') == '2025-09-01'
     
+    def test_invoice_edit_post_updates_lines(self, client, app_context, sample_invoice):
+        """Test POST /invoices/<id>/edit deletes, keeps and adds lines."""
+        VatRate.create_default_rates()
+        standard_vat = VatRate.get_default_rate()
+        kept = InvoiceLine(description='Jääb alles', qty=Decimal('1.00'),
+                           unit_price=Decimal('100.00'), line_total=Decimal('100.00'))
+        removed = InvoiceLine(description='Kustutatakse', qty=Decimal('1.00'),
+                              unit_price=Decimal('50.00'), line_total=Decimal('50.00'))
+        sample_invoice.lines.extend([kept, removed])
+        db.session.commit()
+        
+        form_data = {
+            'number': sample_invoice.number,
+            'client_id': str(sample_invoice.client_id),
+            'date': sample_invoice.date.strftime('%Y-%m-%d'),
+            'due_date': sample_invoice.due_date.strftime('%Y-%m-%d'),
+            'vat_rate_id': str(standard_vat.id),
+            'status': sample_invoice.status,
+            'lines-0-id': str(kept.id),
+            'lines-0-description': 'Jääb alles',
+            'lines-0-qty': '1.00',
+            'lines-0-unit_price': '100.00',
+            'lines-1-description': 'Uus rida',
+            'lines-1-qty': '2.00',
+            'lines-1-unit_price': '10.00'
+        }
+        
+        response = client.post(f'/invoices/{sample_invoice.id}/edit', data=form_data)
+        assert response.status_code == 302
+        
+        assert InvoiceLine.query.filter_by(description='Kustutatakse').count() == 0
+        db.session.refresh(sample_invoice)
+        assert [line.description for line in sample_invoice.lines] == ['Jääb alles', 'Uus rida']
+        assert sample_invoice.subtotal == Decimal('120.00')
+    
+    def test_invoice_edit_post_changes_vat_rate(self, client, app_context, sample_invoice):
+        """Test POST /invoices/<id>/edit keeps the posted VAT rate."""
+        VatRate.create_default_rates()
+        standard_vat = VatRate.get_default_rate()
+        reduced_vat = VatRate.query.filter_by(rate=9).first()
+        sample_invoice.vat_rate_id = standard_vat.id
+        db.session.commit()
+        
+        form_data = {
+            'number': sample_invoice.number,
+            'client_id': str(sample_invoice.client_id),
+            'date': sample_invoice.date.strftime('%Y-%m-%d'),
+            'due_date': sample_invoice.due_date.strftime('%Y-%m-%d'),
+            'vat_rate_id': str(reduced_vat.id),
+            'status': sample_invoice.status,
+            'lines-0-description': 'Teenus',
+            'lines-0-qty': '1.00',
+            'lines-0-unit_price': '100.00'
+        }
+        
+        response = client.post(f'/invoices/{sample_invoice.id}/edit', data=form_data)
+        assert response.status_code == 302
+        
+        db.session.refresh(sample_invoice)
+        assert sample_invoice.vat_rate_id == reduced_vat.id
+        assert sample_invoice.vat_rate == Decimal('9.00')
+        assert sample_invoice.total == Decimal('109.00')
+    
     def test_invoice_duplicate_post(self, client, app_context, sample_invoice):
         """Test POST /invoices/<id>/duplicate - duplicate invoice."""
         original_count = Invoice.query.count()
@@ -347,6 +471,53 @@ class TestDashboardRoutes:
             if invoice.status in ['saadetud', 'makstud']:
                 assert str(invoice.total).encode() in response.data or invoice.number.encode() in response.data
     
+    def test_dashboard_metrics_cached_until_invoice_change(self, client, app_context, sample_client, monkeypatch):
+        """Test dashboard metrics are cached and invalidated on writes."""
+        from app.routes import dashboard
+        
+        monkeypatch.setitem(app_context.config, 'DASHBOARD_CACHE_TTL', 60)
+        app_context.extensions.pop(dashboard.METRICS_CACHE_KEY, None)
+        
+        with patch.object(dashboard, '_compute_overview_metrics',
+                          wraps=dashboard._compute_overview_metrics) as compute:
+            client.get('/')
+            client.get('/')
+            assert compute.call_count == 1
+            
+            sample_client.name = 'Muudetud OÜ'
+            db.session.commit()
+            client.get('/')
+            assert compute.call_count == 2
+        
+        app_context.extensions.pop(dashboard.METRICS_CACHE_KEY, None)
+    
+    def test_vat_rate_edit_recalculates_drafts_only(self, client, app_context, sample_client):
+        """Test a VAT rate change updates draft totals but not issued invoices."""
+        vat_rate = VatRate(name='Test (20%)', rate=Decimal('20.00'))
+        db.session.add(vat_rate)
+        db.session.flush()
+        invoices = {}
+        for number, status in (('2025-0101', 'mustand'), ('2025-0102', 'saadetud')):
+            invoice = Invoice(number=number, client_id=sample_client.id, date=date(2025, 8, 1),
+                              due_date=date(2025, 8, 15), vat_rate_id=vat_rate.id,
+                              vat_rate=Decimal('20.00'), subtotal=Decimal('100.00'),
+                              total=Decimal('120.00'), status=status)
+            invoice.lines.append(InvoiceLine(description='Teenus', qty=Decimal('1.00'),
+                                             unit_price=Decimal('100.00'), line_total=Decimal('100.00')))
+            db.session.add(invoice)
+            invoices[status] = invoice
+        db.session.commit()
+        
+        response = client.post(f'/settings/vat-rates/{vat_rate.id}/edit', data={
+            'name': 'Test (21%)', 'rate': '21.00', 'description': '', 'is_active': 'True'
+        })
+        assert response.status_code == 302
+        
+        db.session.expire_all()
+        assert invoices['mustand'].total == Decimal('121.00')
+        assert invoices['saadetud'].total == Decimal('120.00')
+        assert invoices['saadetud'].vat_rate == Decimal('20.00')
+    
     def test_overview_get(self, client, app_context):
         """Test GET /overview - business overview page."""
         response = client.get('/overview')
@@ -411,6 +582,114 @@ class TestPDFRoutes:
         
         response = client.get(f'/invoices/{sample_invoice.id}/pdf')
         assert response.status_code == 500
+    
+    def test_pdf_cache_reused_until_invoice_change(self, client, app_context, sample_invoice, monkeypatch):
+        """Test rendered PDFs are cached, bounded and keyed by document content."""
+        import sys
+        import types
+        from app.routes import pdf
+        
+        monkeypatch.setitem(app_context.config, 'PDF_CACHE_SIZE', 2)
+        monkeypatch.delitem(app_context.extensions, pdf.PDF_CACHE_KEY, raising=False)
+        render = MagicMock(side_effect=lambda: b'fake-pdf-content')
+        
+        assert pdf._cached_pdf('a', render) == b'fake-pdf-content'
+        assert pdf._cached_pdf('a', render) == b'fake-pdf-content'
+        assert render.call_count == 1
+        
+        # Oldest entry is evicted once the cache is full
+        pdf._cached_pdf('b', render)
+        pdf._cached_pdf('c', render)
+        pdf._cached_pdf('a', render)
+        assert render.call_count == 4
+        
+        # Through the route: a client edit changes the document, hence the key
+        write_pdf = MagicMock(return_value=b'fake-pdf-content')
+        fake_weasyprint = types.SimpleNamespace(HTML=lambda string: types.SimpleNamespace(write_pdf=write_pdf))
+        monkeypatch.setitem(sys.modules, 'weasyprint', fake_weasyprint)
+        monkeypatch.setattr(pdf, '_font_config', lambda: None)
+        url = f'/invoice/{sample_invoice.id}/pdf/standard'
+        
+        assert client.get(url).status_code == 200
+        assert client.get(url).status_code == 200
+        assert write_pdf.call_count == 1
+        
+        sample_invoice.client.name = 'Muudetud OÜ'
+        db.session.commit()
+        assert client.get(url).status_code == 200
+        assert write_pdf.call_count == 2
+    
+    def test_invoice_pdf_conditional_get(self, client, app_context, sample_invoice):
+        """Test a matching If-None-Match answers 304 without rendering."""
+        with patch('app.routes.pdf._cached_pdf', return_value=b'fake-pdf-content') as cached_pdf:
+            response = client.get(f'/invoice/{sample_invoice.id}/pdf/standard')
+            assert response.status_code == 200
+            etag = response.headers['ETag']
+            
+            response = client.get(f'/invoice/{sample_invoice.id}/pdf/standard',
+                                  headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            assert cached_pdf.call_count == 1
+            
+            # Another template is another document
+            response = client.get(f'/invoice/{sample_invoice.id}/pdf/modern',
+                                  headers={'If-None-Match': etag})
+            assert response.status_code == 200
+    
+    def test_invoice_pdf_etag_follows_client_and_lines(self, client, app_context, sample_invoice_line):
+        """Test client and line edits change the PDF ETag."""
+        invoice = sample_invoice_line.invoice
+        url = f'/invoice/{invoice.id}/pdf/standard'
+        with patch('app.routes.pdf._cached_pdf', return_value=b'fake-pdf-content'):
+            etag = client.get(url).headers['ETag']
+            
+            invoice.client.name = 'Ümbernimetatud OÜ'
+            db.session.commit()
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            etag = response.headers['ETag']
+            
+            sample_invoice_line.description = 'Muudetud teenus'
+            db.session.commit()
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 200
+    
+    def test_invoice_preview_conditional_get(self, client, app_context, sample_invoice):
+        """Test the HTML preview is revalidated with its ETag."""
+        response = client.get(f'/invoice/{sample_invoice.id}/preview/standard')
+        assert response.status_code == 200
+        assert 'private' in response.headers['Cache-Control']
+        
+        etag = response.headers['ETag']
+        
+        response = client.get(f'/invoice/{sample_invoice.id}/preview/standard',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        
+        # Client details are printed on the invoice, so the preview changed
+        sample_invoice.client.address = 'Pärnu mnt 10, 10148 Tallinn'
+        db.session.commit()
+        response = client.get(f'/invoice/{sample_invoice.id}/preview/standard',
+                              headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert 'Pärnu mnt 10' in response.get_data(as_text=True)
+    
+    def test_pdf_template_resolution(self):
+        """Test PDF template priority and fallbacks."""
+        from types import SimpleNamespace
+        from app.routes.pdf import _resolve_template
+        
+        settings = SimpleNamespace(default_pdf_template='modern')
+        
+        assert _resolve_template('elegant', {'template': 'standard'}, settings) == 'elegant'
+        assert _resolve_template(None, {'template': 'elegant', 'style': 'standard'}, settings) == 'elegant'
+        assert _resolve_template(None, {'style': 'elegant'}, settings) == 'elegant'
+        assert _resolve_template(None, {}, settings) == 'modern'
+        assert _resolve_template('unknown', {}, settings) == 'modern'
+        
+        settings.default_pdf_template = None
+        assert _resolve_template(None, {'style': 'unknown'}, settings) == 'standard'
 
 
 class TestRouteAuthentication:
@@ -12,6 +12,7 @@ import pytest
 from datetime import date, timedelta
 from decimal import Decimal
 from unittest.mock import patch, MagicMock
+from sqlalchemy import inspect
 
 from app.services.numbering import (
     generate_invoice_number,
@@ -340,6 +341,17 @@ class TestTotalsService:
         result = calculate_subtotal([mock_line])
         assert result == Decimal('0.00')
     
+    def test_calculate_subtotal_line_rows(self):
+        """Test subtotal calculation with line row dicts."""
+        rows = [
+            {'description': 'Service 1', 'line_total': Decimal('100.00')},
+            {'description': 'Service 2', 'line_total': Decimal('151.00')},
+            {'description': 'Service 3', 'line_total': None}
+        ]
+        
+        result = calculate_subtotal(rows)
+        assert result == Decimal('251.00')
+    
     @pytest.mark.parametrize("subtotal,vat_rate,expected", [
         (Decimal('100.00'), Decimal('24.00'), Decimal('24.00')),  # Estonian standard
         (Decimal('100.00'), Decimal('22.00'), Decimal('22.00')),  # Legacy rate
@@ -441,6 +453,33 @@ class TestTotalsService:
         assert invoice.subtotal == Decimal('0.00')
         assert invoice.total == Decimal('0.00')
     
+    def test_calculate_invoice_totals_unloaded_lines(self, sample_client, db_session):
+        """Test totals of a saved invoice are summed in SQL without loading its lines."""
+        invoice = Invoice(
+            number='SQL-TOTALS-001',
+            client_id=sample_client.id,
+            date=date.today(),
+            due_date=date.today() + timedelta(days=14),
+            vat_rate=Decimal('24.00')
+        )
+        db_session.add(invoice)
+        db_session.flush()
+        db_session.add_all([
+            InvoiceLine(invoice_id=invoice.id, description='Rida 1', qty=Decimal('2.00'),
+                        unit_price=Decimal('50.00'), line_total=Decimal('100.00')),
+            InvoiceLine(invoice_id=invoice.id, description='Rida 2', qty=Decimal('1.00'),
+                        unit_price=Decimal('25.50'), line_total=Decimal('25.50'))
+        ])
+        db_session.flush()
+        db_session.expire(invoice, ['lines'])
+        
+        result = calculate_invoice_totals(invoice)
+        
+        assert result['subtotal'] == Decimal('125.50')
+        assert result['vat_amount'] == Decimal('30.12')
+        assert result['total'] == Decimal('155.62')
+        assert 'lines' in inspect(invoice).unloaded
+    
     def test_decimal_precision_maintained(self):
         """Test that calculations maintain proper decimal precision."""
         # Test with amounts that could cause precision issues